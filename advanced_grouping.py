@@ -4,16 +4,53 @@ Advanced Grouping System for Jellyfin IPTV Manager
 Intelligent channel organization by country, category, quality, and custom rules
 """
 
+import os
 import re
 import json
 import logging
-from collections import defaultdict
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import groupby, repeat
+from operator import itemgetter
 from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, field, fields
+
+# Optional imports with fallbacks
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:
+    np = pd = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Upper bound on memoized (name, group) detection results per AdvancedGrouping
+DETECTION_CACHE_SIZE = 131072
+
+# Playlists larger than this are grouped with pandas string ops when available
+VECTORIZE_THRESHOLD = 2000
+
+# Playlists larger than this are split across worker processes on multi-core hosts
+PARALLEL_THRESHOLD = 5000
+
+@dataclass(slots=True)
 class GroupingRule:
     """Represents a grouping rule for channel organization"""
     name: str
@@ -23,19 +60,185 @@ class GroupingRule:
     regex: bool = False
     target_group: str = ""
     conditions: Dict[str, Any] = None
+    any_of: Optional[List[str]] = None  # literal alternatives, used instead of pattern
+    
+    # Matching state derived in __post_init__; slots need it declared up front
+    _compiled: Optional[re.Pattern] = field(default=None, init=False, repr=False, compare=False)
+    _any_of_lower: Optional[List[str]] = field(default=None, init=False, repr=False, compare=False)
 
     def __post_init__(self):
         if self.conditions is None:
             self.conditions = {}
+        
+        # Compile once here rather than on every channel in _rule_matches.
+        # Case-insensitive literals get an escaped IGNORECASE pattern so matching
+        # never has to build lowercased copies of the pattern or channel name.
+        self._compiled = None
+        if self.regex:
+            self._compiled = re.compile(self.pattern, 0 if self.case_sensitive else re.IGNORECASE)
+        elif not self.case_sensitive:
+            self._compiled = re.compile(re.escape(self.pattern), re.IGNORECASE)
+        self._any_of_lower = [p.lower() for p in self.any_of] if self.any_of else None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Shallow field dict for serialization (asdict() would deep-copy every value)"""
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.init}
+
+class PatternMatcher:
+    """Compiled form of a label -> substrings pattern table"""
+    
+    def __init__(self, table: Dict[str, List[str]]):
+        # One alternation per label keeps "first label in table order wins"
+        # semantics while scanning all of a label's substrings in a single C call;
+        # used by the pandas path, where it runs once per column
+        self._label_regexes = [
+            (label, re.compile("|".join(re.escape(p) for p in patterns)))
+            for label, patterns in table.items() if patterns
+        ]
+        self._labels = list(table)
+        self._dispatch = self._compile_dispatch(table)
+        
+        # Optional single-pass scanners, fastest first on short channel strings:
+        # Aho-Corasick, then Hyperscan (its per-match Python callback costs more)
+        self._automaton = self._build_automaton(table) if ahocorasick else None
+        self._hs_database = None
+        if self._automaton is None and hyperscan:
+            self._hs_database = self._build_hyperscan(table)
+    
+    @staticmethod
+    def _compile_dispatch(table: Dict[str, List[str]]):
+        """Generate a straight-line matcher with one inlined `in` test per substring"""
+        # Patterns and labels are embedded via repr(), so any string is safe here
+        lines = ["def match(text):"]
+        for label, patterns in table.items():
+            if patterns:
+                tests = " or ".join(f"{pattern!r} in text" for pattern in patterns)
+                lines.append(f"    if {tests}:")
+                lines.append(f"        return {label!r}")
+        lines.append("    return None")
+        
+        namespace = {}
+        exec("\n".join(lines), namespace)
+        return namespace["match"]
+    
+    @staticmethod
+    def _build_automaton(table: Dict[str, List[str]]):
+        """Build an Aho-Corasick automaton mapping each substring to (rank, label)"""
+        automaton = ahocorasick.Automaton()
+        for rank, (label, patterns) in enumerate(table.items()):
+            for pattern in patterns:
+                # The same substring under two labels belongs to the earlier one
+                if pattern not in automaton:
+                    automaton.add_word(pattern, (rank, label))
+        if len(automaton) == 0:
+            return None
+        automaton.make_automaton()
+        return automaton
+    
+    @staticmethod
+    def _build_hyperscan(table: Dict[str, List[str]]):
+        """Compile every substring into one Hyperscan database, using the label rank as id"""
+        expressions, ids = [], []
+        for rank, patterns in enumerate(table.values()):
+            for pattern in patterns:
+                expressions.append(re.escape(pattern).encode('utf-8'))
+                ids.append(rank)
+        if not expressions:
+            return None
+        
+        try:
+            database = hyperscan.Database()
+            database.compile(
+                expressions=expressions,
+                ids=ids,
+                elements=len(expressions),
+                flags=[hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_SINGLEMATCH] * len(expressions)
+            )
+            return database
+        except hyperscan.error as e:
+            logger.warning(f"Hyperscan compile failed, using fallback matcher: {e}")
+            return None
+    
+    def _hyperscan_match(self, text: str) -> Optional[str]:
+        """Scan once with Hyperscan, stopping early if the first label is hit"""
+        best = []
+        
+        def on_match(rank, start, end, flags, context):
+            if not best or rank < best[0]:
+                best[:] = [rank]
+            return rank == 0  # a truthy return stops the scan
+        
+        try:
+            self._hs_database.scan(text.encode('utf-8'), match_event_handler=on_match)
+        except hyperscan.ScanTerminated:
+            pass
+        return self._labels[best[0]] if best else None
+    
+    def match(self, text: str) -> Optional[str]:
+        """Return the first label whose patterns occur in the (lowercased) text"""
+        if self._automaton is not None:
+            best = None
+            for _, (rank, label) in self._automaton.iter(text):
+                if best is None or rank < best[0]:
+                    best = (rank, label)
+                    if rank == 0:
+                        break
+            return best[1] if best else None
+        
+        if self._hs_database is not None:
+            return self._hyperscan_match(text)
+        
+        return self._dispatch(text)
+    
+    def match_series(self, texts: "pd.Series") -> "pd.Series":
+        """Vectorized match() over a pandas Series of lowercased strings"""
+        labels = pd.Series(None, index=texts.index, dtype=object)
+        remaining = texts
+        for label, regex in self._label_regexes:
+            if remaining.empty:
+                break
+            hits = remaining.str.contains(regex)
+            labels[hits[hits].index] = label
+            remaining = remaining[~hits]
+        return labels
 
 class AdvancedGrouping:
     """Advanced channel grouping with intelligent categorization"""
     
+    # Rank used by the quality_min rule condition; unknown quality ranks lowest
+    _QUALITY_RANK = {'Low': 0, 'SD': 1, 'HD': 2, '4K': 3}
+    
+    # General keywords tried when no explicit category pattern matches
+    _CATEGORY_FALLBACK = {
+        "News": ["news", "breaking", "live"],
+        "Sports": ["sport", "football", "soccer", "basketball"],
+        "Movies": ["movie", "cinema", "film"]
+    }
+    
     def __init__(self):
-        self.country_patterns = self._load_country_patterns()
-        self.category_patterns = self._load_category_patterns()
-        self.quality_patterns = self._load_quality_patterns()
-        self.custom_rules = []
+        self._setup(self._load_country_patterns(), self._load_category_patterns(),
+                    self._load_quality_patterns(), [])
+    
+    def _setup(self, country_patterns: Dict[str, List[str]], category_patterns: Dict[str, List[str]],
+               quality_patterns: Dict[str, List[str]], custom_rules: List[GroupingRule]):
+        """Install pattern tables and rules, compiling each matcher once"""
+        self.country_patterns = country_patterns
+        self.category_patterns = category_patterns
+        self.quality_patterns = quality_patterns
+        self.custom_rules = custom_rules
+        self._sort_rules()
+        
+        # Pattern tables are kept for introspection; detection uses the compiled form
+        self._country_matcher = PatternMatcher(self.country_patterns)
+        self._category_matcher = PatternMatcher(self.category_patterns)
+        self._quality_matcher = PatternMatcher(self.quality_patterns)
+        self._category_fallback_matcher = PatternMatcher(self._CATEGORY_FALLBACK)
+        
+        # Playlists repeat the same names across mirrors, so memoize per instance
+        self._country_cache = lru_cache(maxsize=DETECTION_CACHE_SIZE)(self._detect_country)
+        self._category_cache = lru_cache(maxsize=DETECTION_CACHE_SIZE)(self._detect_category)
+        self._quality_cache = lru_cache(maxsize=DETECTION_CACHE_SIZE)(self._detect_quality)
+        self._detect_all_cache = lru_cache(maxsize=DETECTION_CACHE_SIZE)(self._detect_all)
         
     def _load_country_patterns(self) -> Dict[str, List[str]]:
         """Load country detection patterns"""
@@ -86,80 +289,115 @@ class AdvancedGrouping:
             "Low": ["240p", "360p", "low quality", "mobile"]
         }
     
+    def reload_patterns(self):
+        """Recompile pattern tables and drop memoized results (call after editing them)"""
+        self._country_matcher = PatternMatcher(self.country_patterns)
+        self._category_matcher = PatternMatcher(self.category_patterns)
+        self._quality_matcher = PatternMatcher(self.quality_patterns)
+        self._country_cache.cache_clear()
+        self._category_cache.cache_clear()
+        self._quality_cache.cache_clear()
+        self._detect_all_cache.cache_clear()
+    
     def detect_country(self, channel_name: str, group_title: str = "") -> Optional[str]:
         """Detect country from channel name and group"""
-        text = f"{channel_name} {group_title}".lower()
-        
-        for country, patterns in self.country_patterns.items():
-            for pattern in patterns:
-                if pattern in text:
-                    return country
-        
-        return None
+        return self._country_cache(channel_name, group_title)
+    
+    def _detect_country(self, channel_name: str, group_title: str) -> Optional[str]:
+        return self._country_from_text(f"{channel_name} {group_title}".lower())
+    
+    def _country_from_text(self, text: str) -> Optional[str]:
+        """Detect country in an already lowercased "name group" string"""
+        return self._country_matcher.match(text)
     
     def detect_category(self, channel_name: str, group_title: str = "") -> Optional[str]:
         """Detect category from channel name and group"""
-        text = f"{channel_name} {group_title}".lower()
-        
+        return self._category_cache(channel_name, group_title)
+    
+    def _detect_category(self, channel_name: str, group_title: str) -> Optional[str]:
+        return self._category_from_text(f"{channel_name} {group_title}".lower())
+    
+    def _category_from_text(self, text: str) -> str:
+        """Categorize an already lowercased "name group" string"""
         # Check for explicit category indicators first
-        for category, patterns in self.category_patterns.items():
-            for pattern in patterns:
-                if pattern in text:
-                    return category
+        category = self._category_matcher.match(text)
+        if category:
+            return category
         
         # Fallback to general categorization
-        if any(word in text for word in ["news", "breaking", "live"]):
-            return "News"
-        elif any(word in text for word in ["sport", "football", "soccer", "basketball"]):
-            return "Sports"
-        elif any(word in text for word in ["movie", "cinema", "film"]):
-            return "Movies"
-        
-        return "General"
+        return self._category_fallback_matcher.match(text) or "General"
     
     def detect_quality(self, channel_name: str, stream_url: str = "") -> str:
         """Detect quality from channel name and stream URL"""
-        text = f"{channel_name} {stream_url}".lower()
-        
-        for quality, patterns in self.quality_patterns.items():
-            for pattern in patterns:
-                if pattern in text:
-                    return quality
+        return self._quality_cache(channel_name, stream_url)
+    
+    def _detect_quality(self, channel_name: str, stream_url: str) -> str:
+        return self._quality_from_text(f"{channel_name} {stream_url}".lower())
+    
+    def _quality_from_text(self, text: str) -> str:
+        """Detect quality in an already lowercased "name url" string"""
+        return self._quality_matcher.match(text) or "Unknown"
+    
+    def _detect_all(self, channel_name: str, group_title: str = "",
+                    stream_url: str = "") -> Tuple[Optional[str], str, str]:
+        """Detect country, category and quality from a single lowering of the channel text"""
+        # Each string is lowercased once and shared by all three detectors; formatting
+        # first keeps a None group title working like it does in detect_country
+        text = f"{channel_name} {group_title}".lower()
+        quality_text = f"{channel_name} {stream_url}".lower()
         
-        return "Unknown"
+        return (self._country_from_text(text),
+                self._category_from_text(text),
+                self._quality_from_text(quality_text))
     
     def apply_custom_rules(self, channel_data: Dict[str, Any]) -> Dict[str, Any]:
         """Apply custom grouping rules to channel data"""
-        result = channel_data.copy()
-        
-        for rule in sorted(self.custom_rules, key=lambda x: x.priority, reverse=True):
-            if self._rule_matches(rule, channel_data):
-                if rule.target_group:
-                    result['group'] = rule.target_group
-                
-                # Apply any additional transformations from conditions
-                for key, value in rule.conditions.items():
-                    if key.startswith('set_'):
-                        field = key[4:]  # Remove 'set_' prefix
-                        result[field] = value
-        
-        return result
-    
-    def _rule_matches(self, rule: GroupingRule, channel_data: Dict[str, Any]) -> bool:
-        """Check if a rule matches the channel data"""
+        if not self._sorted_rules:
+            return channel_data
+        
         text = channel_data.get('name', '')
+        text_lower = text.lower()
+        matched = [rule for rule in self._sorted_rules
+                   if self._rule_matches(rule, channel_data, text, text_lower)]
         
-        if rule.regex:
-            pattern = re.compile(rule.pattern, 0 if rule.case_sensitive else re.IGNORECASE)
-            if not pattern.search(text):
-                return False
-        else:
+        # Most channels hit no rule; hand those back without copying
+        if not matched:
+            return channel_data
+        
+        # Collect every override first, then merge into a new dict in one step
+        overrides = {}
+        for rule in matched:
+            if rule.target_group:
+                overrides['group'] = rule.target_group
+            
+            # Apply any additional transformations from conditions
+            for key, value in rule.conditions.items():
+                if key.startswith('set_'):
+                    field_name = key[4:]  # Remove 'set_' prefix
+                    overrides[field_name] = value
+        
+        return {**channel_data, **overrides} if overrides else channel_data
+    
+    def _rule_matches(self, rule: GroupingRule, channel_data: Dict[str, Any],
+                      text: Optional[str] = None, text_lower: Optional[str] = None) -> bool:
+        """Check if a rule matches the channel data"""
+        if text is None:
+            text = channel_data.get('name', '')
+        
+        if rule.any_of:
             if rule.case_sensitive:
-                if rule.pattern not in text:
-                    return False
+                haystack, needles = text, rule.any_of
             else:
-                if rule.pattern.lower() not in text.lower():
-                    return False
+                if text_lower is None:
+                    text_lower = text.lower()
+                haystack, needles = text_lower, rule._any_of_lower
+            if not any(p in haystack for p in needles):
+                return False
+        elif rule._compiled is not None:
+            if not rule._compiled.search(text):
+                return False
+        elif rule.pattern not in text:
+            return False
         
         # Check additional conditions
         for condition_key, condition_value in rule.conditions.items():
@@ -170,9 +408,8 @@ class AdvancedGrouping:
                 if condition_value.lower() not in channel_data.get('group', '').lower():
                     return False
             elif condition_key == 'quality_min':
-                quality_order = ['Low', 'SD', 'HD', '4K']
                 current_quality = self.detect_quality(channel_data.get('name', ''))
-                if quality_order.index(current_quality) < quality_order.index(condition_value):
+                if self._QUALITY_RANK.get(current_quality, -1) < self._QUALITY_RANK.get(condition_value, 0):
                     return False
         
         return True
@@ -180,20 +417,37 @@ class AdvancedGrouping:
     def add_custom_rule(self, rule: GroupingRule):
         """Add a custom grouping rule"""
         self.custom_rules.append(rule)
+        self._sort_rules()
         logger.info(f"Added custom grouping rule: {rule.name}")
     
+    def _sort_rules(self):
+        """Rebuild the priority-ordered rule list used by apply_custom_rules"""
+        self._sorted_rules = sorted(self.custom_rules, key=lambda x: x.priority, reverse=True)
+    
     def remove_custom_rule(self, rule_name: str) -> bool:
         """Remove a custom grouping rule by name"""
         for i, rule in enumerate(self.custom_rules):
             if rule.name == rule_name:
                 del self.custom_rules[i]
+                self._sort_rules()
                 logger.info(f"Removed custom grouping rule: {rule_name}")
                 return True
         return False
     
     def organize_channels(self, channels: List[Dict[str, Any]], 
                          grouping_strategy: str = "smart") -> Dict[str, List[Dict[str, Any]]]:
-        """Organize channels into groups based on strategy"""
+        """Organize channels into groups based on strategy (groups are keyed in name order)"""
+        workers = os.cpu_count() or 1
+        if workers > 1 and len(channels) > PARALLEL_THRESHOLD:
+            return self._organize_channels_parallel(channels, grouping_strategy, workers)
+        
+        return self._organize_channels_serial(channels, grouping_strategy)
+    
+    def _organize_channels_serial(self, channels: List[Dict[str, Any]],
+                                  grouping_strategy: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Organize channels in the current process"""
+        if pd is not None and len(channels) > VECTORIZE_THRESHOLD:
+            return self._organize_channels_vectorized(channels, grouping_strategy)
         
         if grouping_strategy == "country":
             return self._group_by_country(channels)
@@ -206,9 +460,36 @@ class AdvancedGrouping:
         else:
             return self._group_by_original(channels)
     
+    def _organize_channels_parallel(self, channels: List[Dict[str, Any]], grouping_strategy: str,
+                                    workers: int) -> Dict[str, List[Dict[str, Any]]]:
+        """Organize contiguous chunks in a process pool and merge the groups in chunk order"""
+        chunk_size = -(-len(channels) // workers)
+        chunks = [channels[i:i + chunk_size] for i in range(0, len(channels), chunk_size)]
+        
+        merged = {}
+        for part in _get_organize_pool().map(_organize_chunk, repeat(self._worker_state()),
+                                             chunks, repeat(grouping_strategy)):
+            for group_name, members in part.items():
+                merged.setdefault(group_name, []).extend(members)
+        
+        return {group_name: merged[group_name] for group_name in sorted(merged, key=self._group_order)}
+    
+    def _worker_state(self) -> Tuple[Dict[str, List[str]], Dict[str, List[str]],
+                                     Dict[str, List[str]], List[GroupingRule]]:
+        """Picklable state needed to rebuild this grouping in a worker process"""
+        return (self.country_patterns, self.category_patterns,
+                self.quality_patterns, self.custom_rules)
+    
+    @classmethod
+    def _from_worker_state(cls, state) -> 'AdvancedGrouping':
+        """Rebuild a grouping from _worker_state() (compiled matchers are not picklable)"""
+        grouping = cls.__new__(cls)
+        grouping._setup(*state)
+        return grouping
+    
     def _group_by_country(self, channels: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
         """Group channels by detected country"""
-        groups = defaultdict(list)
+        pairs = []
         
         for channel in channels:
             # Apply custom rules first
@@ -216,26 +497,26 @@ class AdvancedGrouping:
             
             country = self.detect_country(channel.get('name', ''), channel.get('group', ''))
             group_name = f"{country} Channels" if country else "International"
-            groups[group_name].append(channel)
+            pairs.append((group_name, channel))
         
-        return dict(groups)
+        return self._bucket_channels(pairs)
     
     def _group_by_category(self, channels: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
         """Group channels by detected category"""
-        groups = defaultdict(list)
+        pairs = []
         
         for channel in channels:
             # Apply custom rules first
             channel = self.apply_custom_rules(channel)
             
             category = self.detect_category(channel.get('name', ''), channel.get('group', ''))
-            groups[category].append(channel)
+            pairs.append((category, channel))
         
-        return dict(groups)
+        return self._bucket_channels(pairs)
     
     def _group_by_quality(self, channels: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
         """Group channels by detected quality"""
-        groups = defaultdict(list)
+        pairs = []
         
         for channel in channels:
             # Apply custom rules first
@@ -243,58 +524,136 @@ class AdvancedGrouping:
             
             quality = self.detect_quality(channel.get('name', ''))
             group_name = f"{quality} Quality"
-            groups[group_name].append(channel)
+            pairs.append((group_name, channel))
         
-        return dict(groups)
+        return self._bucket_channels(pairs)
     
     def _smart_grouping(self, channels: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
         """Smart grouping combining multiple strategies"""
-        groups = defaultdict(list)
+        pairs = []
         
         for channel in channels:
             # Apply custom rules first
             channel = self.apply_custom_rules(channel)
             
             # Determine best grouping strategy for this channel
-            country = self.detect_country(channel.get('name', ''), channel.get('group', ''))
-            category = self.detect_category(channel.get('name', ''), channel.get('group', ''))
-            quality = self.detect_quality(channel.get('name', ''))
+            country, category, quality = self._detect_all_cache(
+                channel.get('name', ''), channel.get('group', ''))
             
-            # Smart grouping logic
-            if country and country != "International":
-                if category in ["News", "Sports"]:
-                    group_name = f"{country} {category}"
-                else:
-                    group_name = f"{country} Channels"
-            elif category and category != "General":
-                if quality in ["4K", "HD"]:
-                    group_name = f"{category} ({quality})"
-                else:
-                    group_name = category
-            else:
-                # Fallback to original group or general
-                group_name = channel.get('group', 'General')
+            group_name = self._smart_group_name(channel, country, category, quality)
+            pairs.append((group_name, channel))
+        
+        return self._bucket_channels(pairs)
+    
+    @staticmethod
+    def _smart_group_name(channel: Dict[str, Any], country: Optional[str],
+                          category: Optional[str], quality: str) -> str:
+        """Pick the smart grouping label from detected attributes"""
+        if country and country != "International":
+            if category in ["News", "Sports"]:
+                return f"{country} {category}"
+            return f"{country} Channels"
+        elif category and category != "General":
+            if quality in ["4K", "HD"]:
+                return f"{category} ({quality})"
+            return category
+        
+        # Fallback to original group or general
+        return channel.get('group', 'General')
+    
+    def _organize_channels_vectorized(self, channels: List[Dict[str, Any]],
+                                      grouping_strategy: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Same result as organize_channels, with detection run as pandas column ops"""
+        channels = [self.apply_custom_rules(channel) for channel in channels]
+        
+        if grouping_strategy not in ("country", "category", "quality", "smart"):
+            labels = [channel.get('group', 'Uncategorized') for channel in channels]
+        else:
+            names = pd.Series([str(channel.get('name', '')) for channel in channels], dtype=object)
+            groups_col = pd.Series([str(channel.get('group', '')) for channel in channels], dtype=object)
+            text = (names + " " + groups_col).str.lower()
             
-            groups[group_name].append(channel)
+            if grouping_strategy == "country":
+                countries = self._country_matcher.match_series(text)
+                labels = [f"{country} Channels" if isinstance(country, str) else "International"
+                          for country in countries]
+            elif grouping_strategy == "category":
+                labels = self._category_series(text).tolist()
+            elif grouping_strategy == "quality":
+                qualities = self._quality_matcher.match_series((names + " ").str.lower())
+                labels = [f"{quality} Quality" for quality in qualities.fillna("Unknown")]
+            else:
+                countries = self._country_matcher.match_series(text)
+                categories = self._category_series(text)
+                qualities = self._quality_matcher.match_series((names + " ").str.lower()).fillna("Unknown")
+                fallback = [channel.get('group', 'General') for channel in channels]
+                labels = self._smart_group_names(countries, categories, qualities, fallback)
         
-        return dict(groups)
+        return self._bucket_channels(list(zip(labels, channels)))
+    
+    @staticmethod
+    def _smart_group_names(countries: "pd.Series", categories: "pd.Series",
+                           qualities: "pd.Series", fallback: List[Any]) -> List[Any]:
+        """Vectorized _smart_group_name over whole detection columns"""
+        has_country = countries.notna() & (countries != "International")
+        has_category = categories.notna() & (categories != "General")
+        conditions = [
+            has_country & categories.isin(["News", "Sports"]),
+            has_country,
+            has_category & qualities.isin(["4K", "HD"]),
+            has_category,
+        ]
+        choices = [
+            countries + " " + categories,
+            countries + " Channels",
+            categories + " (" + qualities + ")",
+            categories,
+        ]
+        fallback_array = np.empty(len(fallback), dtype=object)
+        fallback_array[:] = fallback
+        return np.select([c.to_numpy() for c in conditions],
+                         [c.to_numpy(dtype=object) for c in choices],
+                         default=fallback_array).tolist()
+    
+    def _category_series(self, text: "pd.Series") -> "pd.Series":
+        """Vectorized _category_from_text"""
+        categories = self._category_matcher.match_series(text)
+        missing = categories.isna()
+        if missing.any():
+            fallback = self._category_fallback_matcher.match_series(text[missing])
+            categories[missing] = fallback.fillna("General")
+        return categories
     
     def _group_by_original(self, channels: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
         """Keep original grouping but apply custom rules"""
-        groups = defaultdict(list)
+        pairs = []
         
         for channel in channels:
             # Apply custom rules
             channel = self.apply_custom_rules(channel)
             
             group_name = channel.get('group', 'Uncategorized')
-            groups[group_name].append(channel)
+            pairs.append((group_name, channel))
         
-        return dict(groups)
+        return self._bucket_channels(pairs)
+    
+    @staticmethod
+    def _bucket_channels(pairs: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Collect (group_name, channel) pairs into groups, ordered by group name"""
+        # Stable sort keeps playlist order inside each group
+        pairs.sort(key=lambda pair: AdvancedGrouping._group_order(pair[0]))
+        return {group_name: [channel for _, channel in members]
+                for group_name, members in groupby(pairs, key=itemgetter(0))}
+    
+    @staticmethod
+    def _group_order(group_name: Any) -> Tuple[bool, str]:
+        """Sort key for group names; playlists can carry a None group, which sorts last"""
+        return (group_name is None, "" if group_name is None else str(group_name))
     
     def get_grouping_statistics(self, grouped_channels: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
         """Get statistics about the grouping results"""
-        total_channels = sum(len(channels) for channels in grouped_channels.values())
+        group_sizes = {name: len(channels) for name, channels in grouped_channels.items()}
+        total_channels = sum(group_sizes.values())
         
         stats = {
             'total_channels': total_channels,
@@ -306,40 +665,45 @@ class AdvancedGrouping:
         }
         
         if grouped_channels:
-            for group_name, channels in grouped_channels.items():
+            for group_name, count in group_sizes.items():
                 stats['groups'][group_name] = {
-                    'count': len(channels),
-                    'percentage': (len(channels) / total_channels) * 100 if total_channels > 0 else 0
+                    'count': count,
+                    'percentage': (count / total_channels) * 100 if total_channels > 0 else 0
                 }
             
-            # Find largest and smallest groups
-            group_sizes = [(name, len(channels)) for name, channels in grouped_channels.items()]
-            group_sizes.sort(key=lambda x: x[1])
-            
-            if group_sizes:
-                stats['smallest_group'] = group_sizes[0][0]
-                stats['largest_group'] = group_sizes[-1][0]
-                stats['average_group_size'] = total_channels / len(grouped_channels)
+            # Find largest and smallest groups in one pass each (ties: first smallest, last largest)
+            stats['smallest_group'] = min(group_sizes, key=group_sizes.get)
+            stats['largest_group'] = max(reversed(group_sizes), key=group_sizes.get)
+            stats['average_group_size'] = total_channels / len(grouped_channels)
         
         return stats
     
     def save_rules(self, filepath: str):
         """Save custom rules to file"""
-        rules_data = [asdict(rule) for rule in self.custom_rules]
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(rules_data, f, indent=2, ensure_ascii=False)
+        rules_data = [rule.to_dict() for rule in self.custom_rules]
+        if orjson is not None:
+            with open(filepath, 'wb') as f:
+                f.write(orjson.dumps(rules_data, option=orjson.OPT_INDENT_2))
+        else:
+            with open(filepath, 'w', encoding='utf-8') as f:
+                json.dump(rules_data, f, indent=2, ensure_ascii=False)
         logger.info(f"Saved {len(self.custom_rules)} custom rules to {filepath}")
     
     def load_rules(self, filepath: str):
         """Load custom rules from file"""
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                rules_data = json.load(f)
+            if orjson is not None:
+                with open(filepath, 'rb') as f:
+                    rules_data = orjson.loads(f.read())
+            else:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    rules_data = json.load(f)
             
             self.custom_rules = []
             for rule_dict in rules_data:
                 rule = GroupingRule(**rule_dict)
                 self.custom_rules.append(rule)
+            self._sort_rules()
             
             logger.info(f"Loaded {len(self.custom_rules)} custom rules from {filepath}")
         except FileNotFoundError:
@@ -347,42 +711,63 @@ class AdvancedGrouping:
         except Exception as e:
             logger.error(f"Failed to load rules from {filepath}: {e}")
 
+# Process pool for grouping large playlists, shared by every AdvancedGrouping in the
+# process. Workers are started with forkserver/spawn: organize_channels is called from
+# asyncio.to_thread worker threads, and forking a multithreaded process can deadlock the child.
+_organize_pool = None
+_organize_pool_lock = threading.Lock()
+
+def _get_organize_pool() -> ProcessPoolExecutor:
+    global _organize_pool
+    with _organize_pool_lock:
+        if _organize_pool is None:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _organize_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                                 mp_context=multiprocessing.get_context(method))
+        return _organize_pool
+
+def _organize_chunk(state, channels: List[Dict[str, Any]],
+                    grouping_strategy: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Process pool entry point for AdvancedGrouping._organize_channels_parallel"""
+    grouping = AdvancedGrouping._from_worker_state(state)
+    return grouping._organize_channels_serial(channels, grouping_strategy)
+
 # Example usage and predefined rules
 def create_default_rules() -> List[GroupingRule]:
     """Create a set of default grouping rules"""
     return [
         GroupingRule(
             name="Premium Sports",
-            pattern=r"(espn|fox sports|sky sports)",
-            regex=True,
+            pattern="",
+            any_of=["espn", "fox sports", "sky sports"],
             target_group="Premium Sports",
             priority=10
         ),
         GroupingRule(
             name="News Channels",
-            pattern=r"(cnn|bbc|fox news|msnbc)",
-            regex=True,
+            pattern="",
+            any_of=["cnn", "bbc", "fox news", "msnbc"],
             target_group="International News",
             priority=9
         ),
         GroupingRule(
             name="Kids Content",
-            pattern=r"(disney|nickelodeon|cartoon)",
-            regex=True,
+            pattern="",
+            any_of=["disney", "nickelodeon", "cartoon"],
             target_group="Kids & Family",
             priority=8
         ),
         GroupingRule(
             name="Music Channels",
-            pattern=r"(mtv|vh1|music)",
-            regex=True,
+            pattern="",
+            any_of=["mtv", "vh1", "music"],
             target_group="Music & Entertainment",
             priority=7
         ),
         GroupingRule(
             name="Adult Content Filter",
-            pattern=r"(xxx|adult|18\+)",
-            regex=True,
+            pattern="",
+            any_of=["xxx", "adult", "18+"],
             target_group="Adult",
             priority=15,
             conditions={"set_restricted": True}
@@ -7,24 +7,162 @@ Advanced web interface with real-time monitoring, stream proxy, and API endpoint
 import os
 import json
 import asyncio
+import functools
+import contextlib
+import hashlib
+import mimetypes
+import time
+import multiprocessing
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from pathlib import Path
+from collections import OrderedDict
+from urllib.parse import urlparse
 from datetime import datetime
 import aiohttp
 from aiohttp import web, WSMsgType
-import aiohttp_cors
-import weakref
 
-# Import our enhanced modules
-from advanced_grouping import AdvancedGrouping
-from logo_enhancer import LogoEnhancer
-from stream_health_checker import StreamHealthChecker
-from performance_optimizer import PerformanceOptimizer, IPTVPerformanceManager
-from ip_failover_manager import IPFailoverManager
+# Optional imports with fallbacks
+try:
+    import uvloop
+except ImportError:
+    uvloop = None  # e.g. Windows; stdlib event loop is used
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# Seconds a single WebSocket send may take before the client is dropped
+WS_SEND_TIMEOUT = 2.0
+
+# Outgoing messages buffered per WebSocket client; a client this far behind is dropped
+WS_QUEUE_SIZE = 64
+
+# Protocol-level ping interval (seconds) that detects dead peers, and the largest
+# frame accepted from clients, which only send small control messages
+WS_HEARTBEAT = 20.0
+WS_MAX_MSG_SIZE = 64 * 1024
+
+# Realtime performance pushes: monitoring sample interval, minimum change worth sending
+# (in percentage points) and the longest gap before the last sample is re-sent
+REALTIME_INTERVAL = 30
+REALTIME_MIN_DELTA = 1.0
+REALTIME_MAX_SILENCE = 60
+
+# Upstream fetches for the stream/logo proxies
+PROXY_CHUNK_SIZE = 64 * 1024
+PROXY_PREFETCH_CHUNKS = 2  # read-ahead per connection; bounds memory for slow clients
+PROXY_USER_AGENT = 'VLC/3.0.16 LibVLC/3.0.16'
+
+# Per-connection headers that must not be forwarded by a proxy, plus the framing
+# headers aiohttp recomputes for the re-streamed body
+_HOP_BY_HOP_HEADERS = frozenset({
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te',
+    'trailer', 'trailers', 'transfer-encoding', 'upgrade', 'content-length', 'content-encoding'
+})
+
+# Seconds between checks of the config file's mtime for changes
+CONFIG_WATCH_INTERVAL = 10
+
+# HTTP caching for polled API endpoints
+STATUS_CACHE_SECONDS = 2
+CHANNELS_CACHE_CONTROL = 'public, max-age=300, stale-while-revalidate=60'
+
+# Proxied logos: in-memory LRU of the hottest images, backed by a disk directory
+LOGO_CACHE_SIZE = 1024
+LOGO_CACHE_DIR = Path('logos_cache') / 'proxy'
+LOGO_CACHE_CONTROL = 'public, max-age=86400'
+
+# Compact JSON encoding for API and WebSocket payloads; orjson when installed
+if orjson is not None:
+    _dumpb = orjson.dumps
+    def _dumps(data) -> str:
+        return orjson.dumps(data).decode('utf-8')
+    _loads = orjson.loads  # orjson.JSONDecodeError subclasses json.JSONDecodeError
+else:
+    _dumps = functools.partial(json.dumps, separators=(',', ':'))
+    def _dumpb(data) -> bytes:
+        return _dumps(data).encode('utf-8')
+    _loads = json.loads
+
+_json_response = functools.partial(web.json_response, dumps=_dumps)
+
+# Response timestamps at one-second resolution; formatted once per second, not per call
+@functools.lru_cache(maxsize=1)
+def _iso_second(second: int) -> str:
+    return datetime.fromtimestamp(second).isoformat(timespec='seconds')
+
+def _now_iso() -> str:
+    return _iso_second(int(time.time()))
+
+async def _prefetch(chunks, depth: int):
+    """Read ahead from an async iterator on a separate task, up to `depth` items.
+    
+    Lets the next upstream read overlap the current downstream write. Use inside
+    contextlib.aclosing() so the reader task is cancelled if the consumer stops early.
+    """
+    queue = asyncio.Queue(maxsize=depth)
+    end = object()
+    
+    async def pump():
+        try:
+            async for chunk in chunks:
+                await queue.put(chunk)
+        except Exception as e:
+            await queue.put(e)
+        else:
+            await queue.put(end)
+    
+    reader = asyncio.create_task(pump())
+    try:
+        while True:
+            item = await queue.get()
+            if item is end:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        reader.cancel()
+
+# CORS: any origin may call the API with credentials, as the browser dashboard and
+# Jellyfin plugins are served from other origins. The origin is echoed back because
+# browsers reject a '*' origin on credentialed requests.
+_CORS_HEADERS = {
+    'Access-Control-Allow-Credentials': 'true',
+    'Access-Control-Expose-Headers': '*',
+}
+_CORS_PREFLIGHT_MAX_AGE = '86400'
+
+@web.middleware
+async def _cors_preflight(request, handler):
+    """Answer CORS preflight requests without routing them to a handler"""
+    if request.method == 'OPTIONS' and 'Access-Control-Request-Method' in request.headers:
+        headers = {
+            'Access-Control-Allow-Methods': request.headers['Access-Control-Request-Method'],
+            'Access-Control-Max-Age': _CORS_PREFLIGHT_MAX_AGE,
+        }
+        if 'Access-Control-Request-Headers' in request.headers:
+            headers['Access-Control-Allow-Headers'] = request.headers['Access-Control-Request-Headers']
+        return web.Response(status=204, headers=headers)
+    return await handler(request)
+
+async def _add_cors_headers(request, response):
+    """on_response_prepare hook, so streamed and static responses get the headers too"""
+    origin = request.headers.get('Origin')
+    if origin is not None:
+        response.headers['Access-Control-Allow-Origin'] = origin
+        response.headers.update(_CORS_HEADERS)
+        response.headers.add('Vary', 'Origin')
+
+# Fixed WebSocket replies, serialized once (sent as text frames for the browser's JSON.parse)
+_WS_PONG = _dumps({'type': 'pong'})
+_WS_SUBSCRIBED = _dumps({'type': 'subscribed', 'message': 'Successfully subscribed to updates'})
+_WS_INVALID_JSON = _dumps({'error': 'Invalid JSON'})
+
 class EnhancedWebUI:
     """Enhanced web interface with advanced features"""
     
@@ -34,47 +172,94 @@ class EnhancedWebUI:
         self.app = None
         self.runner = None
         self.site = None
+        self.http: Optional[aiohttp.ClientSession] = None  # shared upstream session
+        self._realtime_task: Optional[asyncio.Task] = None
+        self._config_task: Optional[asyncio.Task] = None
+        
+        # Enhanced components are created on first use (see the properties below)
         
-        # Enhanced components
-        self.grouping = AdvancedGrouping()
-        self.logo_enhancer = LogoEnhancer()
-        self.health_checker = StreamHealthChecker()
-        self.performance_optimizer = PerformanceOptimizer()
-        self.ip_failover_manager = IPFailoverManager()
+        # Realtime pushes are driven by the optimizer's monitoring samples
+        self._latest_metrics = None
+        self._metrics_event = asyncio.Event()
         
         # WebSocket connections for real-time updates
-        self.websockets = weakref.WeakSet()
+        # Each client has a bounded send queue drained by its own writer task
+        self.ws_clients: Dict[web.WebSocketResponse, asyncio.Queue] = {}
+        
+        # Static assets; paths resolved once instead of per request
+        self._static_dir = Path(__file__).parent / 'web_static'
+        self._index_path = self._static_dir / 'dashboard.html'
+        
+        # Logo URL -> (body, etag, content type), least recently used first
+        self._logo_cache: 'OrderedDict[str, Tuple[bytes, str, str]]' = OrderedDict()
+        self._logo_dir = LOGO_CACHE_DIR
         
         # Cache for frequently accessed data
         self.cache = {
+            'config': None,  # parsed config snapshot, reloaded when the file changes
+            'config_mtime': None,
             'channels': None,
+            'channels_body': None,
+            'channels_etag': None,
+            'channel_index': {},  # (provider, channel id) -> channel dict
+            'status': None,
+            'status_time': 0.0,
             'health_reports': None,
             'performance_stats': None,
-            'last_update': None
+            'last_update': None  # time.monotonic() of the last channels refresh
         }
     
+    # Enhanced components: imported and constructed on first use, so a worker that
+    # never touches a feature doesn't pay for its imports or start-up side effects
+    @functools.cached_property
+    def grouping(self):
+        from advanced_grouping import AdvancedGrouping
+        return AdvancedGrouping()
+    
+    @functools.cached_property
+    def logo_enhancer(self):
+        from logo_enhancer import LogoEnhancer
+        return LogoEnhancer()
+    
+    @functools.cached_property
+    def health_checker(self):
+        from stream_health_checker import StreamHealthChecker
+        return StreamHealthChecker()
+    
+    @functools.cached_property
+    def performance_optimizer(self):
+        from performance_optimizer import PerformanceOptimizer
+        optimizer = PerformanceOptimizer()
+        optimizer.register_metrics_callback(self._on_metrics_sample)
+        return optimizer
+    
+    @functools.cached_property
+    def ip_failover_manager(self):
+        from ip_failover_manager import IPFailoverManager
+        return IPFailoverManager()
+    
     def setup_routes(self):
         """Setup web routes and API endpoints"""
-        self.app = web.Application()
+        self.app = web.Application(middlewares=[_cors_preflight])
+        self.app.on_response_prepare.append(_add_cors_headers)
         
-        # Static files
-        self.app.router.add_static('/', Path(__file__).parent / 'web_static', name='static')
+        # Static files, mounted off '/' so they can't shadow the page and API routes
+        if self._static_dir.is_dir():
+            self.app.router.add_static('/static/', self._static_dir, name='static',
+                                       show_index=False, follow_symlinks=False)
         
         # Main pages
         self.app.router.add_get('/', self.index_handler)
         
         # API Routes
-        self.app.router.add_get('/api/status', self.handle_status)
-        self.app.router.add_get('/api/channels', self.handle_channels)
-        self.app.router.add_get('/api/health', self.handle_health_check)
-        self.app.router.add_get('/api/performance', self.handle_performance_stats)
-        self.app.router.add_post('/api/update', self.handle_update_request)
-        self.app.router.add_post('/api/optimize', self.handle_optimize_request)
+        self.app.router.add_get('/api/status', self.api_status)
+        self.app.router.add_get('/api/channels', self.api_channels)
+        self.app.router.add_get('/api/health', self.api_health_check)
         
-        # IP Failover Routes
-        self.app.router.add_get('/api/failover/status', self.handle_failover_status)
-        self.app.router.add_get('/api/failover/sessions', self.handle_failover_sessions)
-        self.app.router.add_get('/stream/{channel_id}', self.handle_failover_stream)
+        # Dashboard actions
+        self.app.router.add_post('/api/health/check', self.api_health_check)
+        self.app.router.add_post('/api/logos/enhance', self.api_enhance_logos)
+        self.app.router.add_post('/api/performance', self.api_optimize_performance)
         
         # Stream proxy endpoints
         self.app.router.add_get('/proxy/stream/{provider}/{channel_id}', self.proxy_stream)
@@ -83,228 +268,31 @@ class EnhancedWebUI:
         # WebSocket for real-time updates
         self.app.router.add_get('/ws', self.websocket_handler)
         
-        # CORS setup
-        cors = aiohttp_cors.setup(self.app, defaults={
-            "*": aiohttp_cors.ResourceOptions(
-                allow_credentials=True,
-                expose_headers="*",
-                allow_headers="*",
-                allow_methods="*"
-            )
-        })
-        
-        # Add CORS to all routes
-        for route in list(self.app.router.routes()):
-            cors.add(route)
+        # Background services follow the app lifecycle, so they run the same way under
+        # start()/stop() and under an external runner such as gunicorn
+        self.app.on_startup.append(self._on_startup)
+        self.app.on_cleanup.append(self._on_cleanup)
     
     async def index_handler(self, request):
         """Main dashboard page"""
-        return web.FileResponse(Path(__file__).parent / 'web_static' / 'index.html')
-    
-    async def dashboard_handler(self, request):
-        """Dashboard with real-time monitoring"""
-        html_content = """
-        <!DOCTYPE html>
-        <html lang="en">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Jellyfin IPTV Manager - Dashboard</title>
-            <style>
-                body { font-family: Arial, sans-serif; margin: 0; padding: 20px; background: #1a1a1a; color: white; }
-                .container { max-width: 1200px; margin: 0 auto; }
-                .header { text-align: center; margin-bottom: 30px; }
-                .stats-grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 20px; margin-bottom: 30px; }
-                .stat-card { background: #2a2a2a; padding: 20px; border-radius: 8px; border-left: 4px solid #00a4dc; }
-                .stat-value { font-size: 2em; font-weight: bold; color: #00a4dc; }
-                .stat-label { color: #ccc; margin-top: 5px; }
-                .chart-container { background: #2a2a2a; padding: 20px; border-radius: 8px; margin-bottom: 20px; }
-                .status-online { color: #4CAF50; }
-                .status-offline { color: #f44336; }
-                .status-warning { color: #ff9800; }
-                .btn { background: #00a4dc; color: white; border: none; padding: 10px 20px; border-radius: 4px; cursor: pointer; }
-                .btn:hover { background: #0082b3; }
-                .log-container { background: #1e1e1e; padding: 15px; border-radius: 4px; max-height: 300px; overflow-y: auto; font-family: monospace; }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>🎬 Jellyfin IPTV Manager Dashboard</h1>
-                    <p>Real-time monitoring and management</p>
-                </div>
-                
-                <div class="stats-grid" id="statsGrid">
-                    <!-- Stats will be populated by JavaScript -->
-                </div>
-                
-                <div class="chart-container">
-                    <h3>System Performance</h3>
-                    <canvas id="performanceChart" width="800" height="200"></canvas>
-                </div>
-                
-                <div class="chart-container">
-                    <h3>Recent Activity</h3>
-                    <div class="log-container" id="activityLog">
-                        <div>Loading activity log...</div>
-                    </div>
-                </div>
-                
-                <div style="text-align: center; margin-top: 30px;">
-                    <button class="btn" onclick="runHealthCheck()">🔍 Run Health Check</button>
-                    <button class="btn" onclick="enhanceLogos()">🖼️ Enhance Logos</button>
-                    <button class="btn" onclick="optimizePerformance()">⚡ Optimize Performance</button>
-                </div>
-            </div>
-            
-            <script>
-                let ws = null;
-                let performanceData = [];
-                
-                function connectWebSocket() {
-                    ws = new WebSocket('ws://localhost:8765/ws');
-                    
-                    ws.onopen = function() {
-                        console.log('WebSocket connected');
-                        addLogEntry('WebSocket connected', 'info');
-                    };
-                    
-                    ws.onmessage = function(event) {
-                        const data = JSON.parse(event.data);
-                        handleRealtimeUpdate(data);
-                    };
-                    
-                    ws.onclose = function() {
-                        console.log('WebSocket disconnected');
-                        addLogEntry('WebSocket disconnected', 'warning');
-                        setTimeout(connectWebSocket, 5000);
-                    };
-                }
-                
-                function handleRealtimeUpdate(data) {
-                    if (data.type === 'stats') {
-                        updateStats(data.data);
-                    } else if (data.type === 'performance') {
-                        updatePerformanceChart(data.data);
-                    } else if (data.type === 'activity') {
-                        addLogEntry(data.message, data.level);
-                    }
-                }
-                
-                function updateStats(stats) {
-                    const grid = document.getElementById('statsGrid');
-                    grid.innerHTML = `
-                        <div class="stat-card">
-                            <div class="stat-value">${stats.total_channels || 0}</div>
-                            <div class="stat-label">Total Channels</div>
-                        </div>
-                        <div class="stat-card">
-                            <div class="stat-value status-online">${stats.online_channels || 0}</div>
-                            <div class="stat-label">Online Channels</div>
-                        </div>
-                        <div class="stat-card">
-                            <div class="stat-value">${stats.total_providers || 0}</div>
-                            <div class="stat-label">Active Providers</div>
-                        </div>
-                        <div class="stat-card">
-                            <div class="stat-value">${stats.cpu_usage || 0}%</div>
-                            <div class="stat-label">CPU Usage</div>
-                        </div>
-                        <div class="stat-card">
-                            <div class="stat-value">${stats.memory_usage || 0}%</div>
-                            <div class="stat-label">Memory Usage</div>
-                        </div>
-                        <div class="stat-card">
-                            <div class="stat-value">${stats.uptime || '0h'}</div>
-                            <div class="stat-label">Uptime</div>
-                        </div>
-                    `;
-                }
-                
-                function addLogEntry(message, level) {
-                    const log = document.getElementById('activityLog');
-                    const timestamp = new Date().toLocaleTimeString();
-                    const levelClass = level === 'error' ? 'status-offline' : 
-                                     level === 'warning' ? 'status-warning' : 'status-online';
-                    
-                    const entry = document.createElement('div');
-                    entry.innerHTML = `<span class="${levelClass}">[${timestamp}]</span> ${message}`;
-                    log.insertBefore(entry, log.firstChild);
-                    
-                    // Keep only last 50 entries
-                    while (log.children.length > 50) {
-                        log.removeChild(log.lastChild);
-                    }
-                }
-                
-                async function runHealthCheck() {
-                    addLogEntry('Starting health check...', 'info');
-                    try {
-                        const response = await fetch('/api/health/check', { method: 'POST' });
-                        const result = await response.json();
-                        addLogEntry(`Health check completed: ${result.summary}`, 'info');
-                    } catch (error) {
-                        addLogEntry(`Health check failed: ${error.message}`, 'error');
-                    }
-                }
-                
-                async function enhanceLogos() {
-                    addLogEntry('Starting logo enhancement...', 'info');
-                    try {
-                        const response = await fetch('/api/logos/enhance', { method: 'POST' });
-                        const result = await response.json();
-                        addLogEntry(`Logo enhancement completed: ${result.enhanced_count} logos enhanced`, 'info');
-                    } catch (error) {
-                        addLogEntry(`Logo enhancement failed: ${error.message}`, 'error');
-                    }
-                }
-                
-                async function optimizePerformance() {
-                    addLogEntry('Optimizing performance...', 'info');
-                    try {
-                        const response = await fetch('/api/performance', { method: 'POST' });
-                        const result = await response.json();
-                        addLogEntry(`Performance optimized: ${result.profile} profile applied`, 'info');
-                    } catch (error) {
-                        addLogEntry(`Performance optimization failed: ${error.message}`, 'error');
-                    }
-                }
-                
-                // Initialize
-                connectWebSocket();
-                
-                // Load initial data
-                fetch('/api/status')
-                    .then(response => response.json())
-                    .then(data => updateStats(data))
-                    .catch(error => addLogEntry(`Failed to load initial data: ${error.message}`, 'error'));
-            </script>
-        </body>
-        </html>
-        """
-        return web.Response(text=html_content, content_type='text/html')
-    
-    async def channels_handler(self, request):
-        """Channels management page"""
-        return web.Response(text="<h1>Channels Management</h1><p>Coming soon...</p>", content_type='text/html')
-    
-    async def health_handler(self, request):
-        """Health monitoring page"""
-        return web.Response(text="<h1>Health Monitoring</h1><p>Coming soon...</p>", content_type='text/html')
-    
-    async def settings_handler(self, request):
-        """Settings page"""
-        return web.Response(text="<h1>Settings</h1><p>Coming soon...</p>", content_type='text/html')
+        # FileResponse uses sendfile() where the platform supports it
+        return web.FileResponse(self._index_path, headers={'Cache-Control': 'public, max-age=60'})
     
     async def api_status(self, request):
         """API endpoint for system status"""
         try:
-            config = self.iptv_manager.load_config()
+            # Dashboards poll this; share one snapshot across requests for a couple of seconds
+            now = time.monotonic()
+            if self.cache['status'] is not None and now - self.cache['status_time'] < STATUS_CACHE_SECONDS:
+                return _json_response(self.cache['status'],
+                                      headers={'Cache-Control': f'max-age={STATUS_CACHE_SECONDS}'})
+            
+            config = await self._get_config()
             providers = config.get('providers', [])
             enabled_providers = [p for p in providers if p.get('enabled', True)]
             
             # Get performance metrics
-            metrics = self.performance_optimizer.get_system_metrics()
+            metrics = await self._get_metrics()
             
             status = {
                 'total_providers': len(enabled_providers),
@@ -313,14 +301,54 @@ class EnhancedWebUI:
                 'cpu_usage': round(metrics.cpu_percent, 1),
                 'memory_usage': round(metrics.memory_percent, 1),
                 'uptime': f"{int(metrics.timestamp - self.iptv_manager.start_time)}s" if hasattr(self.iptv_manager, 'start_time') else '0s',
-                'last_update': datetime.now().isoformat()
+                'last_update': _now_iso()
             }
+            self.cache['status'] = status
+            self.cache['status_time'] = now
             
-            return web.json_response(status)
+            return _json_response(status, headers={'Cache-Control': f'max-age={STATUS_CACHE_SECONDS}'})
             
         except Exception as e:
             logger.error(f"Status API error: {e}")
-            return web.json_response({'error': str(e)}, status=500)
+            return _json_response({'error': str(e)}, status=500)
+    
+    async def _get_config(self) -> Dict[str, Any]:
+        """Current config snapshot, loaded off the event loop on first use"""
+        if self.cache['config'] is None:
+            await self._reload_config()
+        return self.cache['config']
+    
+    async def _reload_config(self):
+        path = getattr(self.iptv_manager, 'config_file', None)
+        if path is not None:
+            self.cache['config_mtime'] = await asyncio.to_thread(self._config_mtime, path)
+        self.cache['config'] = await asyncio.to_thread(self.iptv_manager.load_config)
+    
+    @staticmethod
+    def _config_mtime(path) -> Optional[float]:
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+    
+    async def _config_watcher(self, path):
+        """Reload the config snapshot when its file changes on disk"""
+        try:
+            while True:
+                await asyncio.sleep(CONFIG_WATCH_INTERVAL)
+                mtime = await asyncio.to_thread(self._config_mtime, path)
+                if mtime != self.cache['config_mtime']:
+                    logger.info("Configuration changed on disk, reloading")
+                    await self._reload_config()
+                    self.cache['last_update'] = None  # channels are rebuilt on next use
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Config watcher error: {e}")
+    
+    async def _get_metrics(self):
+        """Sample system metrics on a worker thread (psutil blocks for ~1s per sample)"""
+        return await asyncio.to_thread(self.performance_optimizer.get_system_metrics)
     
     async def api_channels(self, request):
         """API endpoint for channels list"""
@@ -329,11 +357,20 @@ class EnhancedWebUI:
             if self.cache['channels'] is None or self._cache_expired():
                 await self._refresh_channels_cache()
             
-            return web.json_response(self.cache['channels'])
+            etag = self.cache['channels_etag']
+            if etag is None:
+                return _json_response(self.cache['channels'])
+            
+            headers = {'ETag': etag, 'Cache-Control': CHANNELS_CACHE_CONTROL}
+            if request.headers.get('If-None-Match') == etag:
+                return web.Response(status=304, headers=headers)
+            
+            return web.Response(body=self.cache['channels_body'], headers=headers,
+                                content_type='application/json')
             
         except Exception as e:
             logger.error(f"Channels API error: {e}")
-            return web.json_response({'error': str(e)}, status=500)
+            return _json_response({'error': str(e)}, status=500)
     
     async def api_health_check(self, request):
         """API endpoint to trigger health check"""
@@ -344,7 +381,7 @@ class EnhancedWebUI:
                 result = {
                     'status': 'completed',
                     'summary': 'Health check completed successfully',
-                    'timestamp': datetime.now().isoformat()
+                    'timestamp': _now_iso()
                 }
             
             # Broadcast to WebSocket clients
@@ -354,11 +391,11 @@ class EnhancedWebUI:
                 'level': 'info'
             })
             
-            return web.json_response(result)
+            return _json_response(result)
             
         except Exception as e:
             logger.error(f"Health check API error: {e}")
-            return web.json_response({'error': str(e)}, status=500)
+            return _json_response({'error': str(e)}, status=500)
     
     async def api_enhance_logos(self, request):
         """API endpoint to enhance logos"""
@@ -367,7 +404,7 @@ class EnhancedWebUI:
             result = {
                 'status': 'completed',
                 'enhanced_count': 0,  # Would be actual count
-                'timestamp': datetime.now().isoformat()
+                'timestamp': _now_iso()
             }
             
             # Broadcast to WebSocket clients
@@ -377,33 +414,67 @@ class EnhancedWebUI:
                 'level': 'info'
             })
             
-            return web.json_response(result)
+            return _json_response(result)
             
         except Exception as e:
             logger.error(f"Logo enhancement API error: {e}")
-            return web.json_response({'error': str(e)}, status=500)
+            return _json_response({'error': str(e)}, status=500)
+    
+    async def api_optimize_performance(self, request):
+        """API endpoint to pick and apply the best performance profile for current load"""
+        try:
+            # Profile selection samples system metrics, which blocks
+            optimizer = self.performance_optimizer
+            profile = await asyncio.to_thread(optimizer.select_optimal_profile)
+            optimizer.apply_profile(profile)
+            
+            result = {
+                'status': 'completed',
+                'profile': profile.name,
+                'timestamp': _now_iso()
+            }
+            
+            # Broadcast to WebSocket clients
+            await self._broadcast_websocket({
+                'type': 'activity',
+                'message': f'Performance profile applied: {profile.name}',
+                'level': 'info'
+            })
+            
+            return _json_response(result)
+            
+        except Exception as e:
+            logger.error(f"Performance optimization API error: {e}")
+            return _json_response({'error': str(e)}, status=500)
     
     async def websocket_handler(self, request):
         """WebSocket handler for real-time updates"""
-        ws = web.WebSocketResponse()
+        # permessage-deflate keeps one compression context per connection across
+        # messages, so the repeated JSON templates of the periodic pushes shrink well
+        ws = web.WebSocketResponse(compress=True, heartbeat=WS_HEARTBEAT,
+                                   max_msg_size=WS_MAX_MSG_SIZE)
         await ws.prepare(request)
         
-        self.websockets.add(ws)
+        queue = asyncio.Queue(maxsize=WS_QUEUE_SIZE)
+        writer = asyncio.create_task(self._ws_writer(ws, queue))
+        self.ws_clients[ws] = queue
         logger.info("WebSocket client connected")
         
         try:
             async for msg in ws:
                 if msg.type == WSMsgType.TEXT:
                     try:
-                        data = json.loads(msg.data)
+                        data = _loads(msg.data)
                         await self._handle_websocket_message(ws, data)
                     except json.JSONDecodeError:
-                        await ws.send_str(json.dumps({'error': 'Invalid JSON'}))
+                        self._ws_enqueue(ws, _WS_INVALID_JSON)
                 elif msg.type == WSMsgType.ERROR:
                     logger.error(f'WebSocket error: {ws.exception()}')
         except Exception as e:
             logger.error(f"WebSocket handler error: {e}")
         finally:
+            self.ws_clients.pop(ws, None)
+            writer.cancel()
             logger.info("WebSocket client disconnected")
         
         return ws
@@ -414,61 +485,284 @@ class EnhancedWebUI:
         
         if message_type == 'subscribe':
             # Client wants to subscribe to updates
-            await ws.send_str(json.dumps({
-                'type': 'subscribed',
-                'message': 'Successfully subscribed to updates'
-            }))
+            self._ws_enqueue(ws, _WS_SUBSCRIBED)
         elif message_type == 'ping':
-            await ws.send_str(json.dumps({'type': 'pong'}))
+            # Liveness is covered by protocol pings (heartbeat); this is for clients
+            # that check it at the application level
+            self._ws_enqueue(ws, _WS_PONG)
+    
+    async def _ws_writer(self, ws, queue: asyncio.Queue):
+        """Drain one client's send queue; the only task that writes to the socket"""
+        get, send_str, wait_for = queue.get, ws.send_str, asyncio.wait_for
+        try:
+            while True:
+                message = await get()
+                await wait_for(send_str(message), timeout=WS_SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Dropping WebSocket client after failed send: {e}")
+            self._drop_websocket(ws)
+    
+    def _ws_enqueue(self, ws, message: str):
+        """Queue a message for one client, dropping the client if it has fallen behind"""
+        queue = self.ws_clients.get(ws)
+        if queue is None:
+            return
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning("Dropping WebSocket client with full send queue")
+            self._drop_websocket(ws)
+    
+    def _drop_websocket(self, ws):
+        """Forget a client and close its socket, which ends its handler loop"""
+        if self.ws_clients.pop(ws, None) is not None:
+            asyncio.ensure_future(ws.close())
     
     async def _broadcast_websocket(self, data):
         """Broadcast data to all connected WebSocket clients"""
-        if not self.websockets:
+        if not self.ws_clients:
             return
         
-        message = json.dumps(data)
-        disconnected = []
-        
-        for ws in self.websockets:
-            try:
-                await ws.send_str(message)
-            except Exception:
-                disconnected.append(ws)
+        message = _dumps(data)  # serialized once for every client
         
-        # Remove disconnected clients
-        for ws in disconnected:
-            self.websockets.discard(ws)
+        # Fan-out is a non-blocking put per client; writer tasks do the I/O.
+        # Snapshot because a full queue removes its client from the dict.
+        enqueue = self._ws_enqueue
+        for ws in list(self.ws_clients):
+            enqueue(ws, message)
     
     async def _refresh_channels_cache(self):
-        """Refresh channels cache"""
+        """Refresh channels cache from every enabled provider's playlist"""
         try:
-            config = self.iptv_manager.load_config()
-            providers = config.get('providers', [])
+            config = await self._get_config()
+            group_filters = config.get('group_filters', {})
+            channel_mapping = config.get('channel_mapping', {})
+            providers = [provider for provider in config.get('providers', [])
+                         if provider.get('enabled', True)]
             
-            all_channels = []
-            for provider in providers:
-                if provider.get('enabled', True):
-                    # This would parse M3U content and extract channels
-                    # Simplified for demo
-                    provider_channels = {
-                        'provider': provider.get('name', ''),
-                        'channels': []  # Would contain actual channel data
-                    }
-                    all_channels.append(provider_channels)
+            all_channels = list(await asyncio.gather(
+                *(self._load_provider_channels(provider, group_filters, channel_mapping)
+                  for provider in providers)))
             
+            # Serialize once per refresh; the body hash doubles as the ETag
+            body = _dumpb(all_channels)
+            self.cache['channel_index'] = {
+                (entry['provider'], str(channel.get('id'))): channel
+                for entry in all_channels for channel in entry['channels']
+            }
             self.cache['channels'] = all_channels
-            self.cache['last_update'] = datetime.now()
+            self.cache['channels_body'] = body
+            self.cache['channels_etag'] = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+            self.cache['last_update'] = time.monotonic()
             
         except Exception as e:
             logger.error(f"Failed to refresh channels cache: {e}")
     
+    async def _load_provider_channels(self, provider: Dict[str, Any], group_filters: Dict[str, Any],
+                                      channel_mapping: Dict[str, Any]) -> Dict[str, Any]:
+        """Download and parse one provider's playlist on worker threads"""
+        name = provider.get('name', '')
+        channels = []
+        try:
+            m3u_content = await asyncio.to_thread(self.iptv_manager.download_m3u, name)
+            if m3u_content:
+                parsed = await asyncio.to_thread(self.iptv_manager.parse_m3u_channels, m3u_content,
+                                                 provider, group_filters, channel_mapping)
+                channels = [self._channel_entry(channel) for channel in parsed]
+        except Exception as e:
+            logger.error(f"Failed to load channels for {name}: {e}")
+        return {'provider': name, 'channels': channels}
+    
+    def _channel_entry(self, channel: Dict[str, Any]) -> Dict[str, Any]:
+        """API view of a parsed channel: its content ID and best-resolution stream URL"""
+        best = max(channel['streams'], key=lambda stream: stream['resolution_rank'])
+        return {
+            'id': self.iptv_manager.create_content_id(channel['name']),
+            'name': channel['name'],
+            'group': channel['group'],
+            'category': channel.get('category'),
+            'epg_id': channel['epg_id'],
+            'logo': channel['logo'],
+            'url': best['url']
+        }
+    
+    def _get_http_session(self) -> aiohttp.ClientSession:
+        """Shared upstream session, so proxied requests reuse pooled connections"""
+        if self.http is None or self.http.closed:
+            self.http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=512, limit_per_host=32,
+                                               ttl_dns_cache=300, enable_cleanup_closed=True),
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=15, sock_read=30),
+                headers={'User-Agent': PROXY_USER_AGENT}
+            )
+        return self.http
+    
+    async def _lookup_channel(self, provider: str, channel_id: str) -> Optional[Dict[str, Any]]:
+        """Find a cached channel by provider name and channel id"""
+        if self.cache['channels'] is None or self._cache_expired():
+            await self._refresh_channels_cache()
+        return self.cache['channel_index'].get((provider, channel_id))
+    
+    async def _proxy_upstream(self, request, url: str) -> web.StreamResponse:
+        """Stream an upstream resource to the client chunk by chunk"""
+        response = None
+        try:
+            async with self._get_http_session().get(url) as upstream:
+                headers = {name: value for name, value in upstream.headers.items()
+                           if name.lower() not in _HOP_BY_HOP_HEADERS}
+                response = web.StreamResponse(status=upstream.status, headers=headers)
+                await response.prepare(request)
+                
+                write = response.write
+                chunks = _prefetch(upstream.content.iter_chunked(PROXY_CHUNK_SIZE),
+                                   PROXY_PREFETCH_CHUNKS)
+                async with contextlib.aclosing(chunks):
+                    async for chunk in chunks:
+                        await write(chunk)
+                
+                await response.write_eof()
+                return response
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            logger.warning(f"Proxy request to {url} failed: {e!r}")
+            if response is not None and response.prepared:
+                return response  # headers already sent; the truncated body ends the stream
+            if isinstance(e, asyncio.TimeoutError):
+                return web.Response(status=504, text="Upstream timeout")
+            return web.Response(status=502, text="Upstream request failed")
+        except ConnectionResetError:
+            # The client went away mid-stream; aiohttp < 3.10 raises the bare builtin here
+            # (newer releases raise ClientConnectionResetError, handled above)
+            logger.debug(f"Client disconnected while proxying {url}")
+            if response is None:
+                raise
+            return response
+    
+    async def proxy_stream(self, request):
+        """Proxy a channel's live stream"""
+        provider = request.match_info['provider']
+        channel = await self._lookup_channel(provider, request.match_info['channel_id'])
+        if not channel or not channel.get('url'):
+            return web.Response(status=404, text="Channel not found")
+        return await self._proxy_upstream(request, channel['url'])
+    
+    async def proxy_logo(self, request):
+        """Proxy a channel's logo image, served from the memory/disk cache when possible"""
+        provider = request.match_info['provider']
+        channel = await self._lookup_channel(provider, request.match_info['channel_id'])
+        if not channel or not channel.get('logo'):
+            return web.Response(status=404, text="Logo not found")
+        
+        url = channel['logo']
+        entry = self._logo_cache.get(url)
+        if entry is not None:
+            self._logo_cache.move_to_end(url)
+        else:
+            entry = await asyncio.to_thread(self._read_logo_file, url)
+            if entry is None:
+                entry = await self._fetch_logo(url)
+                if entry is None:
+                    return web.Response(status=502, text="Logo unavailable")
+            self._remember_logo(url, entry)
+        
+        body, etag, content_type = entry
+        headers = {'ETag': etag, 'Cache-Control': LOGO_CACHE_CONTROL}
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=body, headers=headers, content_type=content_type)
+    
+    async def _fetch_logo(self, url: str) -> Optional[Tuple[bytes, str, str]]:
+        """Download a logo and persist it to the disk cache"""
+        try:
+            async with self._get_http_session().get(url) as upstream:
+                if upstream.status != 200:
+                    logger.warning(f"Logo fetch from {url} returned HTTP {upstream.status}")
+                    return None
+                body = await upstream.read()
+                content_type = upstream.content_type
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            logger.warning(f"Logo fetch from {url} failed: {e!r}")
+            return None
+        
+        if not content_type.startswith('image/'):
+            content_type = self._guess_logo_type(url)
+        await asyncio.to_thread(self._write_logo_file, url, body)
+        return body, self._logo_etag(body), content_type
+    
+    def _remember_logo(self, url: str, entry: Tuple[bytes, str, str]):
+        """Add a logo to the in-memory LRU, evicting the oldest entry when full"""
+        self._logo_cache[url] = entry
+        if len(self._logo_cache) > LOGO_CACHE_SIZE:
+            self._logo_cache.popitem(last=False)
+    
+    def _logo_path(self, url: str) -> Path:
+        return self._logo_dir / hashlib.blake2b(url.encode('utf-8'), digest_size=16).hexdigest()
+    
+    def _read_logo_file(self, url: str) -> Optional[Tuple[bytes, str, str]]:
+        try:
+            body = self._logo_path(url).read_bytes()
+        except OSError:
+            return None
+        return body, self._logo_etag(body), self._guess_logo_type(url)
+    
+    def _write_logo_file(self, url: str, body: bytes):
+        # Write then rename, so a concurrent reader never sees a partial image
+        path = self._logo_path(url)
+        tmp = path.with_suffix('.tmp')
+        try:
+            self._logo_dir.mkdir(parents=True, exist_ok=True)
+            tmp.write_bytes(body)
+            tmp.replace(path)
+        except OSError as e:
+            logger.warning(f"Could not cache logo {url} on disk: {e}")
+    
+    @staticmethod
+    def _logo_etag(body: bytes) -> str:
+        return f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+    
+    @staticmethod
+    def _guess_logo_type(url: str) -> str:
+        content_type, _ = mimetypes.guess_type(urlparse(url).path)
+        if content_type and content_type.startswith('image/'):
+            return content_type
+        return 'image/png'
+    
     def _cache_expired(self, max_age_minutes: int = 5) -> bool:
         """Check if cache has expired"""
         if self.cache['last_update'] is None:
             return True
         
-        age = (datetime.now() - self.cache['last_update']).total_seconds() / 60
-        return age > max_age_minutes
+        # Monotonic clock: unaffected by NTP or manual wall-clock changes
+        return time.monotonic() - self.cache['last_update'] > max_age_minutes * 60
+    
+    async def _on_startup(self, app):
+        """Open the upstream session and start monitoring and real-time updates"""
+        self._get_http_session()
+        
+        # Load the config once; afterwards only reloaded when the file changes
+        await self._reload_config()
+        path = getattr(self.iptv_manager, 'config_file', None)
+        if path is not None:
+            self._config_task = asyncio.create_task(self._config_watcher(path))
+        
+        # Start performance monitoring
+        self.performance_optimizer.start_monitoring(REALTIME_INTERVAL)
+        
+        # Start real-time update task
+        self._realtime_task = asyncio.create_task(self._realtime_update_loop())
+    
+    async def _on_cleanup(self, app):
+        """Stop background work and release the upstream session"""
+        self.performance_optimizer.stop_monitoring()
+        
+        for task in (self._realtime_task, self._config_task):
+            if task is not None:
+                task.cancel()
+        self._realtime_task = self._config_task = None
+        if self.http is not None:
+            await self.http.close()
+            self.http = None
     
     async def start(self):
         """Start the enhanced web UI server"""
@@ -481,14 +775,8 @@ class EnhancedWebUI:
             self.site = web.TCPSite(self.runner, '0.0.0.0', self.port)
             await self.site.start()
             
-            # Start performance monitoring
-            self.performance_optimizer.start_monitoring()
-            
             logger.info(f"Enhanced Web UI started on http://0.0.0.0:{self.port}")
             
-            # Start real-time update task
-            asyncio.create_task(self._realtime_update_loop())
-            
         except Exception as e:
             logger.error(f"Failed to start Enhanced Web UI: {e}")
             raise
@@ -496,35 +784,54 @@ class EnhancedWebUI:
     async def stop(self):
         """Stop the enhanced web UI server"""
         try:
-            self.performance_optimizer.stop_monitoring()
-            
             if self.site:
                 await self.site.stop()
             if self.runner:
-                await self.runner.cleanup()
+                await self.runner.cleanup()  # runs _on_cleanup
             
             logger.info("Enhanced Web UI stopped")
             
         except Exception as e:
             logger.error(f"Error stopping Enhanced Web UI: {e}")
     
+    def _on_metrics_sample(self, metrics):
+        """Monitoring loop callback: hand the new sample to the realtime loop"""
+        self._latest_metrics = metrics
+        self._metrics_event.set()
+    
     async def _realtime_update_loop(self):
-        """Send real-time updates to WebSocket clients"""
+        """Send real-time updates to WebSocket clients as metrics samples arrive"""
+        last_sent = None  # (cpu_percent, memory_percent, monotonic send time)
         try:
             while True:
-                # Send performance updates every 30 seconds
-                metrics = self.performance_optimizer.get_system_metrics()
+                # Sleep until a sample arrives; with clients connected, wake after the
+                # silence window too so they still get a periodic refresh
+                try:
+                    await asyncio.wait_for(self._metrics_event.wait(),
+                                           REALTIME_MAX_SILENCE if self.ws_clients else None)
+                except asyncio.TimeoutError:
+                    pass
+                self._metrics_event.clear()
                 
-                await self._broadcast_websocket({
-                    'type': 'performance',
-                    'data': {
-                        'cpu_percent': metrics.cpu_percent,
-                        'memory_percent': metrics.memory_percent,
-                        'timestamp': metrics.timestamp
-                    }
-                })
+                metrics = self._latest_metrics
+                if metrics is None or not self.ws_clients:
+                    continue
+                now = time.monotonic()
                 
-                await asyncio.sleep(30)
+                # Only push when the numbers moved or the clients haven't heard from us in a while
+                if (last_sent is None
+                        or abs(metrics.cpu_percent - last_sent[0]) > REALTIME_MIN_DELTA
+                        or abs(metrics.memory_percent - last_sent[1]) > REALTIME_MIN_DELTA
+                        or now - last_sent[2] >= REALTIME_MAX_SILENCE):
+                    await self._broadcast_websocket({
+                        'type': 'performance',
+                        'data': {
+                            'cpu_percent': metrics.cpu_percent,
+                            'memory_percent': metrics.memory_percent,
+                            'timestamp': metrics.timestamp
+                        }
+                    })
+                    last_sent = (metrics.cpu_percent, metrics.memory_percent, now)
                 
         except asyncio.CancelledError:
             logger.info("Real-time update loop cancelled")
@@ -560,6 +867,49 @@ class EnhancedIPTVManager:
         except Exception as e:
             logger.error(f"Error stopping enhanced features: {e}")
 
+# Production entry points
+async def app_factory() -> web.Application:
+    """Build the web UI application for an external runner.
+    
+    Each worker process gets its own event loop, upstream session and WebSocket
+    clients; the real-time pushes carry host-wide metrics, so every worker can
+    serve them independently. For example:
+    
+        gunicorn enhanced_web_ui:app_factory --bind 0.0.0.0:8765 \\
+            --worker-class aiohttp.GunicornUVLoopWebWorker --workers $(nproc) --reuse-port
+    """
+    from iptv_manager import MultiProviderM3UConverter
+    
+    web_ui = EnhancedWebUI(MultiProviderM3UConverter())
+    web_ui.iptv_manager.start_time = datetime.now().timestamp()
+    web_ui.setup_routes()
+    return web_ui.app
+
+def _serve_worker(port: int):
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    web.run_app(app_factory(), port=port, reuse_port=True, print=None)
+
+def run_workers(workers: Optional[int] = None, port: int = 8765):
+    """Serve the web UI from several processes sharing one port (SO_REUSEPORT).
+    
+    For deployments without gunicorn; the kernel spreads incoming connections
+    across the workers. Not available on Windows.
+    """
+    workers = workers or os.cpu_count() or 1
+    processes = [multiprocessing.Process(target=_serve_worker, args=(port,), daemon=True)
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    logger.info(f"Enhanced Web UI serving on http://0.0.0.0:{port} with {workers} workers")
+    
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
 # Example usage
 async def main():
     """Example usage of enhanced web UI"""
@@ -584,4 +934,7 @@ async def main():
         await enhanced_manager.stop_enhanced_features()
 
 if __name__ == "__main__":
+    # libuv-based loop cuts per-callback overhead for the server and WebSocket fan-out
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
     asyncio.run(main())
@@ -5,26 +5,62 @@ Complete integration of all SparkleTV features with existing IPTV Manager
 """
 
 import asyncio
+import hashlib
+import json
 import logging
+import math
+import random
+import signal
 import sys
 import os
+import time
 from pathlib import Path
 
-# Import all enhanced modules
-from advanced_grouping import AdvancedGrouping, create_default_rules
-from logo_enhancer import LogoEnhancer, IPTVLogoEnhancer
-from stream_health_checker import StreamHealthChecker, IPTVHealthMonitor
-from performance_optimizer import PerformanceOptimizer, IPTVPerformanceManager
-from enhanced_web_ui import EnhancedWebUI, EnhancedIPTVManager
+# Optional imports with fallbacks
+try:
+    import uvloop
+except ImportError:
+    uvloop = None  # e.g. Windows; stdlib event loop is used
 
 logger = logging.getLogger(__name__)
 
+# Providers downloaded and parsed at the same time during a comprehensive update
+PROVIDER_CONCURRENCY = 8
+
+# Parsed playlists are reused for this many seconds without re-downloading. Entries
+# are refreshed a little early at random (scaled by how long the last fetch took,
+# times M3U_CACHE_BETA) so concurrent updates don't all expire at once.
+M3U_CACHE_TTL = 300
+M3U_CACHE_BETA = 1.0
+
+# Provider count above which health summaries are totalled with numpy (if installed);
+# below it the interpreter's sum() is faster than building arrays
+HEALTH_SUMMARY_VECTORIZE_THRESHOLD = 1000
+
+# One HTTP connection pool shared by logo enhancement and health monitoring, so
+# keep-alive connections and DNS lookups carry over between update phases
+HTTP_CONNECTION_LIMIT = 256
+HTTP_CONNECTION_LIMIT_PER_HOST = 16
+HTTP_DNS_CACHE_TTL = 600
+HTTP_TIMEOUT = 15
+
+# Seconds an integration status snapshot is reused (dashboards poll it)
+STATUS_CACHE_SECONDS = 2.0
+
 class IntegratedIPTVManager:
     """Fully integrated IPTV Manager with all SparkleTV features"""
     
     def __init__(self, original_iptv_manager):
         self.original_manager = original_iptv_manager
         
+        # Enhanced modules (pandas, aiohttp, psutil, ...) are imported here rather than at
+        # module level so importing this module stays cheap
+        from advanced_grouping import AdvancedGrouping, create_default_rules
+        from logo_enhancer import IPTVLogoEnhancer
+        from stream_health_checker import IPTVHealthMonitor
+        from performance_optimizer import IPTVPerformanceManager
+        from enhanced_web_ui import EnhancedIPTVManager
+        
         # Initialize enhanced components
         self.grouping = AdvancedGrouping()
         self.logo_enhancer = IPTVLogoEnhancer(original_iptv_manager)
@@ -32,6 +68,16 @@ class IntegratedIPTVManager:
         self.performance_manager = IPTVPerformanceManager(original_iptv_manager)
         self.enhanced_manager = EnhancedIPTVManager(original_iptv_manager)
         
+        # Shared HTTP session, opened by start_all_services()
+        self._http = None
+        
+        # Provider name -> (content digest, fetched at, fetch seconds, channels)
+        self._m3u_cache = {}
+        
+        # Last get_integration_status() result and its time.monotonic()
+        self._status_cache = None
+        self._status_cached_at = 0.0
+        
         # Setup default grouping rules
         for rule in create_default_rules():
             self.grouping.add_custom_rule(rule)
@@ -41,11 +87,25 @@ class IntegratedIPTVManager:
     async def start_all_services(self):
         """Start all enhanced services"""
         try:
+            # Open the shared HTTP session (needs the running event loop)
+            if self._http is None or self._http.closed:
+                import aiohttp
+                self._http = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit=HTTP_CONNECTION_LIMIT,
+                                                   limit_per_host=HTTP_CONNECTION_LIMIT_PER_HOST,
+                                                   ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+                                                   enable_cleanup_closed=True),
+                    timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+                )
+                self.logo_enhancer.use_session(self._http)
+                self.health_monitor.use_session(self._http)
+            
             # Start performance optimization
             self.performance_manager.start_optimization()
             
             # Start enhanced web UI
             await self.enhanced_manager.start_enhanced_features()
+            self._status_cache = None
             
             logger.info("All enhanced services started successfully")
             
@@ -62,6 +122,12 @@ class IntegratedIPTVManager:
             # Stop enhanced web UI
             await self.enhanced_manager.stop_enhanced_features()
             
+            await self.logo_enhancer.close()
+            if self._http is not None:
+                await self._http.close()
+                self._http = None
+            self._status_cache = None
+            
             logger.info("All enhanced services stopped")
             
         except Exception as e:
@@ -72,47 +138,52 @@ class IntegratedIPTVManager:
         logger.info("Starting comprehensive IPTV update with all enhancements...")
         
         try:
-            # 1. Run original update process
-            self.original_manager.run_update(force=force)
+            # 1. Run original update process (blocking, can take minutes; run it on a
+            # worker thread so the web UI and WebSocket clients keep being served)
+            await asyncio.to_thread(self.original_manager.run_update, force=force)
             
-            # 2. Get all parsed content
-            config = self.original_manager.load_config()
+            # 2. Get all parsed content; config is read once for the whole update
+            config = await asyncio.to_thread(self.original_manager.load_config)
             providers = config.get('providers', [])
+            # (name, provider) pairs, computed once and reused by every phase below
+            enabled = tuple((p.get('name', ''), p) for p in providers if p.get('enabled', True))
+            parse_settings = (config.get('group_filters', {}), config.get('channel_mapping', {}))
+            
+            # Download and parse all providers concurrently; results keep provider order
+            semaphore = asyncio.Semaphore(PROVIDER_CONCURRENCY)
+            settings_key = json.dumps(parse_settings, sort_keys=True, default=str).encode('utf-8')
+            results = await asyncio.gather(
+                *(self._fetch_and_parse(provider, parse_settings, settings_key, semaphore, force)
+                  for _, provider in enabled),
+                return_exceptions=True
+            )
             
             all_channels = []
-            for provider in providers:
-                if provider.get('enabled', True):
-                    provider_name = provider.get('name', '')
-                    
-                    # Get M3U content
-                    m3u_content = self.original_manager.download_m3u(provider_name)
-                    if m3u_content:
-                        # Parse with enhanced grouping
-                        parsed_content = self.original_manager.parse_m3u_content(
-                            m3u_content, provider, 
-                            config.get('group_filters', {}),
-                            config.get('channel_mapping', {})
-                        )
-                        
-                        # Convert to channel list for processing
-                        for category, channels in parsed_content.items():
-                            for channel_name, channel_data in channels.items():
-                                channel_data['provider'] = provider_name
-                                channel_data['category'] = category
-                                all_channels.append(channel_data)
+            for (name, _), result in zip(enabled, results):
+                if isinstance(result, Exception):
+                    logger.error("Failed to process provider %s: %s", name, result)
+                else:
+                    all_channels.extend(result)
             
             # 3. Apply advanced grouping
             logger.info("Applying advanced grouping...")
-            grouped_channels = self.grouping.organize_channels(all_channels, strategy="smart")
+            # CPU-bound; large playlists are sharded across a process pool inside
+            # organize_channels, and the thread keeps the event loop free meanwhile
+            grouped_channels = await asyncio.to_thread(
+                self.grouping.organize_channels, all_channels, grouping_strategy="smart")
             grouping_stats = self.grouping.get_grouping_statistics(grouped_channels)
-            logger.info(f"Grouping completed: {grouping_stats['total_groups']} groups, "
-                       f"{grouping_stats['total_channels']} channels")
+            logger.info("Grouping completed: %s groups, %s channels",
+                        grouping_stats['total_groups'], grouping_stats['total_channels'])
             
-            # 4. Enhance logos
+            # 4. Enhance logos (providers concurrently; a failing provider doesn't stop the rest)
             logger.info("Enhancing channel logos...")
-            for provider in providers:
-                if provider.get('enabled', True):
-                    await self.logo_enhancer.enhance_provider_logos(provider.get('name', ''))
+            results = await asyncio.gather(
+                *(self._enhance_provider_logos(name, semaphore) for name, _ in enabled),
+                return_exceptions=True
+            )
+            for (name, _), result in zip(enabled, results):
+                if isinstance(result, Exception):
+                    logger.error("Logo enhancement failed for %s: %s", name, result)
             
             # 5. Run health check
             logger.info("Running comprehensive health check...")
@@ -121,7 +192,7 @@ class IntegratedIPTVManager:
             # 6. Generate comprehensive report
             report = {
                 'update_timestamp': self.original_manager.get_current_timestamp(),
-                'providers_processed': len([p for p in providers if p.get('enabled', True)]),
+                'providers_processed': len(enabled),
                 'total_channels': len(all_channels),
                 'grouping_statistics': grouping_stats,
                 'health_summary': self._summarize_health_reports(health_reports),
@@ -129,39 +200,109 @@ class IntegratedIPTVManager:
             }
             
             logger.info("Comprehensive update completed successfully")
-            logger.info(f"Report: {report}")
+            # The full report is large; only render it when someone is listening
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Report: %s", report)
             
             return report
             
         except Exception as e:
-            logger.error(f"Comprehensive update failed: {e}")
+            logger.error("Comprehensive update failed: %s", e)
             raise
     
-    def _summarize_health_reports(self, health_reports):
-        """Summarize health check results"""
-        summary = {
-            'total_providers': len(health_reports),
-            'healthy_providers': 0,
-            'total_channels_checked': 0,
-            'online_channels': 0
-        }
+    async def _fetch_and_parse(self, provider, parse_settings, settings_key, semaphore, force=False):
+        """Download and parse one provider's M3U into a flat channel list.
         
-        for provider_name, report in health_reports.items():
-            if 'error' not in report:
-                summary['healthy_providers'] += 1
-                health_data = report.get('health_report', {})
-                summary['total_channels_checked'] += health_data.get('summary', {}).get('total_channels', 0)
-                summary['online_channels'] += health_data.get('summary', {}).get('online_channels', 0)
+        parse_settings is (group_filters, channel_mapping) and settings_key its
+        serialized form. Recent results are served from the playlist cache; an
+        unchanged download (same content and parse settings) reuses the previous parse.
+        """
+        provider_name = provider.get('name', '')
+        group_filters, channel_mapping = parse_settings
         
-        if summary['total_channels_checked'] > 0:
-            summary['overall_success_rate'] = (summary['online_channels'] / summary['total_channels_checked']) * 100
+        cached = self._m3u_cache.get(provider_name)
+        if cached is not None and not force and self._m3u_cache_fresh(cached):
+            return cached[3]
+        
+        async with semaphore:
+            started = time.monotonic()
+            
+            # Blocking download, hashing and CPU-bound parse run on worker threads
+            m3u_content, digest = await asyncio.to_thread(self._download_playlist, provider, settings_key)
+            if not m3u_content:
+                return []
+            
+            if cached is not None and cached[0] == digest:
+                channels = cached[3]
+            else:
+                # Parse straight into a flat channel list tagged with provider and category
+                channels = await asyncio.to_thread(
+                    self.original_manager.parse_m3u_channels,
+                    m3u_content, provider, group_filters, channel_mapping
+                )
+        
+        self._m3u_cache[provider_name] = (digest, time.monotonic(), time.monotonic() - started, channels)
+        return channels
+    
+    def _download_playlist(self, provider, settings_key):
+        """Download a provider's M3U and fingerprint it with the parse settings (blocking)"""
+        m3u_content = self.original_manager.download_m3u(provider.get('name', ''))
+        if not m3u_content:
+            return None, None
+        
+        digest = hashlib.blake2b(m3u_content.encode('utf-8'), digest_size=16)
+        digest.update(settings_key)
+        digest.update(json.dumps(provider, sort_keys=True, default=str).encode('utf-8'))
+        return m3u_content, digest.hexdigest()
+    
+    @staticmethod
+    def _m3u_cache_fresh(entry):
+        """Whether a playlist cache entry can be served (probabilistic early expiry)"""
+        _, fetched_at, cost, _ = entry
+        jitter = -cost * M3U_CACHE_BETA * math.log(1.0 - random.random())
+        return time.monotonic() + jitter < fetched_at + M3U_CACHE_TTL
+    
+    async def _enhance_provider_logos(self, provider_name, semaphore):
+        async with semaphore:
+            await self.logo_enhancer.enhance_provider_logos(provider_name)
+    
+    def _summarize_health_reports(self, health_reports):
+        """Summarize health check results"""
+        summaries = [report.get('health_report', {}).get('summary', {})
+                     for report in health_reports.values() if 'error' not in report]
+        np = None
+        if len(summaries) > HEALTH_SUMMARY_VECTORIZE_THRESHOLD:
+            try:
+                import numpy as np
+            except ImportError:
+                pass
+        if np is not None:
+            count = len(summaries)
+            total_checked = int(np.fromiter((summary.get('total_channels', 0) for summary in summaries),
+                                            dtype=np.int64, count=count).sum())
+            online = int(np.fromiter((summary.get('online_channels', 0) for summary in summaries),
+                                     dtype=np.int64, count=count).sum())
         else:
-            summary['overall_success_rate'] = 0
+            total_checked = sum(summary.get('total_channels', 0) for summary in summaries)
+            online = sum(summary.get('online_channels', 0) for summary in summaries)
         
-        return summary
+        return {
+            'total_providers': len(health_reports),
+            'healthy_providers': len(summaries),
+            'total_channels_checked': total_checked,
+            'online_channels': online,
+            'overall_success_rate': 100.0 * online / max(total_checked, 1)
+        }
     
     def get_integration_status(self):
-        """Get status of all integrated components"""
+        """Get status of all integrated components (cached for STATUS_CACHE_SECONDS)"""
+        now = time.monotonic()
+        if self._status_cache is None or now - self._status_cached_at >= STATUS_CACHE_SECONDS:
+            self._status_cache = self._build_integration_status()
+            self._status_cached_at = now
+        return self._status_cache
+    
+    def _build_integration_status(self):
         return {
             'grouping': {
                 'enabled': True,
@@ -184,7 +325,7 @@ class IntegratedIPTVManager:
             'enhanced_web_ui': {
                 'enabled': True,
                 'port': self.enhanced_manager.web_ui.port,
-                'websocket_clients': len(self.enhanced_manager.web_ui.websockets)
+                'websocket_clients': len(self.enhanced_manager.web_ui.ws_clients)
             }
         }
 
@@ -218,6 +359,16 @@ async def main():
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
     
+    # Sleep until SIGINT/SIGTERM instead of polling
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass  # Windows: Ctrl+C still ends the run through asyncio.run
+    
+    integrated_manager = None
     try:
         # Create integrated manager
         integrated_manager = integrate_with_existing_manager()
@@ -225,42 +376,42 @@ async def main():
         # Start all services
         await integrated_manager.start_all_services()
         
-        print("🚀 Enhanced Jellyfin IPTV Manager started successfully!")
-        print(f"📊 Web Dashboard: http://localhost:8765")
-        print(f"🔧 Recent Channels Plugin: Install RecentChannelsPlugin to Jellyfin")
+        logger.info("Enhanced Jellyfin IPTV Manager started successfully")
+        logger.info("Web Dashboard: http://localhost:8765")
+        logger.info("Recent Channels Plugin: install RecentChannelsPlugin to Jellyfin")
         
         # Show integration status
         status = integrated_manager.get_integration_status()
-        print("\n📋 Integration Status:")
-        for component, details in status.items():
-            enabled = "✅" if details.get('enabled') else "❌"
-            print(f"  {enabled} {component.replace('_', ' ').title()}")
+        logger.info("Integration status: %s", ", ".join(
+            "%s %s" % (component.replace('_', ' ').title(), "enabled" if details.get('enabled') else "disabled")
+            for component, details in status.items()))
         
         # Run a comprehensive update
-        print("\n🔄 Running comprehensive update...")
+        logger.info("Running comprehensive update...")
         report = await integrated_manager.run_comprehensive_update()
         
-        print(f"\n📈 Update Summary:")
-        print(f"  • Providers: {report['providers_processed']}")
-        print(f"  • Channels: {report['total_channels']}")
-        print(f"  • Groups: {report['grouping_statistics']['total_groups']}")
-        print(f"  • Health: {report['health_summary']['overall_success_rate']:.1f}% success rate")
+        logger.info("Update summary: providers=%d channels=%d groups=%d health=%.1f%% success rate",
+                    report['providers_processed'], report['total_channels'],
+                    report['grouping_statistics']['total_groups'],
+                    report['health_summary']['overall_success_rate'])
         
-        print("\n🎯 All features are now active!")
-        print("Press Ctrl+C to stop...")
+        logger.info("All features are now active; press Ctrl+C to stop")
         
         # Keep running
-        while True:
-            await asyncio.sleep(1)
+        await stop_event.wait()
+        logger.info("Shutting down...")
             
-    except KeyboardInterrupt:
-        print("\n🛑 Shutting down...")
-        await integrated_manager.stop_all_services()
-        print("✅ Shutdown complete")
-        
     except Exception as e:
-        logger.error(f"Integration failed: {e}")
+        logger.error("Integration failed: %s", e)
         sys.exit(1)
+        
+    finally:
+        if integrated_manager is not None:
+            await integrated_manager.stop_all_services()
+            logger.info("Shutdown complete")
 
 if __name__ == "__main__":
+    # libuv-based loop for the concurrent provider, logo and health-check fetches
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
     asyncio.run(main())
@@ -6,23 +6,156 @@ to maintain compliance with IPTV providers that only allow 1 IP connection per l
 """
 
 import asyncio
+import functools
 import logging
 import json
 import time
 import hashlib
+import re
+import socket
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple
-from dataclasses import dataclass, asdict
-from collections import defaultdict
-import ipaddress
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from collections import OrderedDict, defaultdict
 import aiohttp
 from aiohttp import web
 import sqlite3
 import threading
 
+# Optional imports with fallbacks
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# Session rows and failover events are written behind the request path: queued sessions
+# are coalesced per IP and flushed with the events in one transaction every
+# SESSION_FLUSH_INTERVAL seconds, or sooner once SESSION_FLUSH_BATCH rows are pending
+SESSION_FLUSH_INTERVAL = 0.1
+SESSION_FLUSH_BATCH = 500
+
+# Connection pool shared by stream proxying, playlist fetches and health checks
+HTTP_CONNECTION_LIMIT = 200
+HTTP_DNS_CACHE_TTL = 300
+HTTP_KEEPALIVE_TIMEOUT = 60
+
+# Seconds a provider's parsed M3U playlist is reused before it is downloaded again
+M3U_CACHE_TTL = 300
+# Channel ids per playlist whose #EXTINF scan result is remembered (ids come from request URLs)
+M3U_RESOLVED_CACHE_SIZE = 1024
+
+_TVG_ID_RE = re.compile(r'tvg-id="([^"]+)"')
+
+# Headers that may carry the real client IP behind proxies, in order of preference
+_IP_HEADERS = (
+    'X-Forwarded-For',
+    'X-Real-IP',
+    'X-Client-IP',
+    'CF-Connecting-IP'  # Cloudflare
+)
+
+# JSON for the channels_accessed column and the API responses; orjson when installed.
+# Both encoders write naive datetimes as isoformat().
+if orjson is not None:
+    def _dumps(data) -> str:
+        return orjson.dumps(data).decode('utf-8')
+    _loads = orjson.loads
+else:
+    def _json_default(obj):
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    _dumps = functools.partial(json.dumps, separators=(',', ':'), default=_json_default)
+    _loads = json.loads
+
+_json_response = functools.partial(web.json_response, dumps=_dumps)
+
+# Embeds JSON text already stored in the database without re-encoding it (orjson >= 3.9);
+# otherwise it is decoded so the encoder can write it back out
+if orjson is not None and hasattr(orjson, 'Fragment'):
+    _json_fragment = orjson.Fragment
+else:
+    _json_fragment = _loads
+
+def _bucket(value: str, buckets: int) -> int:
+    """Stable bucket for value in range(buckets), the same across processes and restarts"""
+    digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') % buckets
+
+def _is_ip_address(value: str) -> bool:
+    """Whether value is a literal IPv4 or IPv6 address (checked in C, no objects built)"""
+    try:
+        socket.inet_pton(socket.AF_INET, value)
+        return True
+    except OSError:
+        pass
+    try:
+        socket.inet_pton(socket.AF_INET6, value)
+        return True
+    except OSError:
+        return False
+
+# Seconds a status report is reused (dashboards poll /status)
+STATUS_CACHE_SECONDS = 5.0
+
+# Most recently watched channels remembered per session
+SESSION_CHANNEL_HISTORY = 64
+
+# Proxied stream bodies are relayed to the client in chunks of this many bytes
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Milliseconds a statement waits on a locked database before raising
+SQLITE_BUSY_TIMEOUT_MS = 5000
+
+# Bytes of the database file read through mmap, and page cache size (KiB)
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+SQLITE_CACHE_SIZE_KIB = 64 * 1024
+
+_INSERT_SESSION_SQL = """
+    INSERT OR REPLACE INTO ip_sessions 
+    (ip_address, user_id, provider_name, failover_tier, session_start, 
+     last_activity, channels_accessed, connection_count)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Hot queries are module constants so every call hits sqlite3's prepared-statement
+# cache (keyed by SQL text) instead of being parsed again
+_SELECT_ACTIVE_SESSIONS_SQL = """
+    SELECT ip_address, user_id, provider_name, failover_tier,
+           session_start, last_activity, channels_accessed, connection_count
+    FROM ip_sessions 
+    WHERE last_activity > ?
+"""
+
+_COUNT_SESSIONS_BY_PROVIDER_SQL = """
+    SELECT provider_name, COUNT(*)
+    FROM ip_sessions
+    WHERE last_activity > ?
+    GROUP BY provider_name
+"""
+
+_INSERT_EVENT_SQL = """
+    INSERT INTO failover_events 
+    (ip_address, user_id, from_provider, to_provider, reason)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+_UPSERT_HEALTH_SQL = """
+    INSERT INTO provider_health
+    (provider_name, tier, health_status, last_check, response_time_ms, error_count)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(provider_name) DO UPDATE SET
+        tier = excluded.tier,
+        health_status = excluded.health_status,
+        last_check = excluded.last_check,
+        response_time_ms = excluded.response_time_ms,
+        error_count = provider_health.error_count + excluded.error_count
+"""
+
 @dataclass
 class IPSession:
     """Represents an active IP session"""
@@ -32,8 +165,10 @@ class IPSession:
     failover_tier: int
     session_start: datetime
     last_activity: datetime
-    channels_accessed: List[str]
+    channels_accessed: Dict[str, None]  # ordered set of channel ids, most recent last
     connection_count: int
+    # IPFailoverManager._routing_epoch when this provider was chosen (not persisted)
+    decided_at_epoch: int = field(default=-1, compare=False, repr=False)
 
 @dataclass
 class FailoverProvider:
@@ -43,24 +178,95 @@ class FailoverProvider:
     m3u_url: str
     xtream_config: Optional[Dict] = None
     max_concurrent_ips: int = 1
-    active_ips: Set[str] = None
+    active_ip_count: int = 0  # active sessions currently assigned here (see _track_session)
     health_status: str = "unknown"  # healthy, degraded, offline
     last_health_check: Optional[datetime] = None
+    # Xtream live stream URL up to the channel id, built once from xtream_config
+    _xtream_live_prefix: Optional[str] = field(default=None, init=False, repr=False, compare=False)
 
     def __post_init__(self):
-        if self.active_ips is None:
-            self.active_ips = set()
+        if self.xtream_config:
+            config = self.xtream_config
+            self._xtream_live_prefix = f"{config['server_url']}/live/{config['username']}/{config['password']}/"
+
+    def xtream_stream_url(self, channel_id: str) -> str:
+        """Xtream API live stream URL for a channel"""
+        return f"{self._xtream_live_prefix}{channel_id}.m3u8"
+
+@dataclass
+class M3UPlaylist:
+    """A provider playlist parsed once and indexed for stream lookups"""
+    fetched_at: float  # time.monotonic()
+    channels: Dict[str, str]  # tvg-id / channel name / resolved lookup -> stream URL
+    entries: List[Tuple[str, str]]  # (#EXTINF line, stream URL) in playlist order
+    streams: List[str]  # every stream URL, for the hash-based fallback
+    # channel id -> #EXTINF scan result (None: no match), least recently used first
+    resolved: "OrderedDict[str, Optional[str]]" = field(default_factory=OrderedDict)
+
+    @classmethod
+    def parse(cls, content: str) -> "M3UPlaylist":
+        channels = {}
+        entries = []
+        streams = []
+        extinf = None
+        for line in content.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('#'):
+                if line.startswith('#EXTINF:'):
+                    extinf = line
+                continue
+            streams.append(line)
+            if extinf is not None:
+                entries.append((extinf, line))
+                tvg_id = _TVG_ID_RE.search(extinf)
+                if tvg_id:
+                    channels.setdefault(tvg_id.group(1), line)
+                name = extinf.rsplit(',', 1)[-1].strip()
+                if name:
+                    channels.setdefault(name, line)
+                extinf = None
+        return cls(time.monotonic(), channels, entries, streams)
 
 class IPFailoverDatabase:
     """SQLite database for IP failover tracking"""
     
     def __init__(self, db_path: str = "ip_failover.db"):
         self.db_path = db_path
+        # One connection for the lifetime of the database object. Autocommit mode;
+        # multi-row writes use explicit transactions (see _transaction). The lock
+        # serializes callers from the event loop and from worker threads.
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        self._conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        self._conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KIB}")
+        self._conn.execute("PRAGMA temp_store=MEMORY")
         self.init_database()
     
+    @contextmanager
+    def _transaction(self):
+        """Run a group of statements under one lock hold and one commit"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+    
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+    
     def init_database(self):
         """Initialize database tables"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._transaction() as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS ip_sessions (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -104,57 +310,95 @@ class IPFailoverDatabase:
             conn.execute("CREATE INDEX IF NOT EXISTS idx_ip_sessions_ip ON ip_sessions(ip_address)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_ip_sessions_provider ON ip_sessions(provider_name)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_failover_events_ip ON failover_events(ip_address)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ip_sessions_last_activity ON ip_sessions(last_activity)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ip_sessions_provider_activity "
+                         "ON ip_sessions(provider_name, last_activity)")
     
     def add_session(self, session: IPSession):
         """Add or update IP session"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                INSERT OR REPLACE INTO ip_sessions 
-                (ip_address, user_id, provider_name, failover_tier, session_start, 
-                 last_activity, channels_accessed, connection_count)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                session.ip_address, session.user_id, session.provider_name,
+        self.add_sessions_bulk([session])
+    
+    def add_sessions_bulk(self, sessions: List[IPSession]):
+        """Add or update several IP sessions in a single transaction"""
+        self.add_session_rows([self.session_row(session) for session in sessions])
+    
+    @staticmethod
+    def session_row(session: IPSession) -> Tuple:
+        """Column values for a session; snapshots channels_accessed, which is updated in place"""
+        return (session.ip_address, session.user_id, session.provider_name,
                 session.failover_tier, session.session_start, session.last_activity,
-                json.dumps(session.channels_accessed), session.connection_count
-            ))
+                _dumps(list(session.channels_accessed)), session.connection_count)
+    
+    def add_session_rows(self, rows: List[Tuple]):
+        """Write session_row() tuples in a single transaction"""
+        with self._transaction() as conn:
+            conn.executemany(_INSERT_SESSION_SQL, rows)
     
     def get_active_sessions(self, cutoff_minutes: int = 30) -> List[IPSession]:
         """Get active sessions within cutoff time"""
+        rows = self.get_active_session_rows(cutoff_minutes)
+        
+        # Timestamps are parsed with the C fromisoformat; PARSE_DECLTYPES would route them
+        # through sqlite3's pure-Python converter instead
+        fromisoformat = datetime.fromisoformat
+        return [
+            IPSession(
+                ip_address=ip_address,
+                user_id=user_id,
+                provider_name=provider_name,
+                failover_tier=failover_tier,
+                session_start=fromisoformat(session_start),
+                last_activity=fromisoformat(last_activity),
+                channels_accessed=dict.fromkeys(_loads(channels_accessed or "[]")),
+                connection_count=connection_count
+            )
+            for (ip_address, user_id, provider_name, failover_tier, session_start,
+                 last_activity, channels_accessed, connection_count) in rows
+        ]
+    
+    def get_active_session_rows(self, cutoff_minutes: int = 30) -> List[Tuple]:
+        """Raw active session rows, columns in IPSession field order, timestamps and
+        channels_accessed as stored text"""
         cutoff_time = datetime.now() - timedelta(minutes=cutoff_minutes)
         
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("""
-                SELECT ip_address, user_id, provider_name, failover_tier,
-                       session_start, last_activity, channels_accessed, connection_count
-                FROM ip_sessions 
-                WHERE last_activity > ?
-            """, (cutoff_time,))
-            
-            sessions = []
-            for row in cursor.fetchall():
-                sessions.append(IPSession(
-                    ip_address=row[0],
-                    user_id=row[1],
-                    provider_name=row[2],
-                    failover_tier=row[3],
-                    session_start=datetime.fromisoformat(row[4]),
-                    last_activity=datetime.fromisoformat(row[5]),
-                    channels_accessed=json.loads(row[6] or "[]"),
-                    connection_count=row[7]
-                ))
-            
-            return sessions
+        # Bound as a datetime so it is adapted to the same 'YYYY-MM-DD HH:MM:SS' text the
+        # rows were stored with, keeping the comparison (and the last_activity index) valid
+        with self._lock:
+            return self._conn.execute(_SELECT_ACTIVE_SESSIONS_SQL, (cutoff_time,)).fetchall()
+    
+    def count_sessions_by_provider(self, cutoff_minutes: int = 30) -> Dict[str, int]:
+        """Number of active sessions per provider, counted by SQLite"""
+        cutoff_time = datetime.now() - timedelta(minutes=cutoff_minutes)
+        
+        with self._lock:
+            rows = self._conn.execute(_COUNT_SESSIONS_BY_PROVIDER_SQL, (cutoff_time,)).fetchall()
+        return dict(rows)
+    
+    def write_batch(self, session_rows: List[Tuple], events: List[Tuple[str, str, str, str, str]],
+                    health_rows: Optional[List[Tuple]] = None):
+        """Write session_row() tuples, failover events and health rows in a single transaction"""
+        with self._transaction() as conn:
+            if session_rows:
+                conn.executemany(_INSERT_SESSION_SQL, session_rows)
+            if events:
+                conn.executemany(_INSERT_EVENT_SQL, events)
+            if health_rows:
+                conn.executemany(_UPSERT_HEALTH_SQL, health_rows)
+    
+    def upsert_health_bulk(self, rows: List[Tuple]):
+        """Record (provider_name, tier, health_status, last_check, response_time_ms, failed) rows"""
+        with self._transaction() as conn:
+            conn.executemany(_UPSERT_HEALTH_SQL, rows)
     
     def log_failover_event(self, ip_address: str, user_id: str, from_provider: str, 
                           to_provider: str, reason: str):
         """Log a failover event"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                INSERT INTO failover_events 
-                (ip_address, user_id, from_provider, to_provider, reason)
-                VALUES (?, ?, ?, ?, ?)
-            """, (ip_address, user_id, from_provider, to_provider, reason))
+        self.log_events_bulk([(ip_address, user_id, from_provider, to_provider, reason)])
+    
+    def log_events_bulk(self, events: List[Tuple[str, str, str, str, str]]):
+        """Log several (ip_address, user_id, from_provider, to_provider, reason) events at once"""
+        with self._transaction() as conn:
+            conn.executemany(_INSERT_EVENT_SQL, events)
 
 class IPFailoverManager:
     """Main IP-based failover manager"""
@@ -163,9 +407,26 @@ class IPFailoverManager:
         self.config_path = config_path
         self.db = IPFailoverDatabase()
         self.providers: Dict[str, FailoverProvider] = {}
-        self.active_sessions: Dict[str, IPSession] = {}  # ip_address -> session
-        self.ip_to_provider_mapping: Dict[str, str] = {}  # ip -> provider_name
+        # ip_address -> session; the single source of truth for per-IP state
+        self.active_sessions: Dict[str, IPSession] = {}
         self.monitoring_active = False
+        # Sessions and failover events waiting to be persisted (see _db_writer)
+        self._write_queue: asyncio.Queue = asyncio.Queue()
+        self._db_writer_task: Optional[asyncio.Task] = None
+        # Upstream HTTP session, created on first use inside the running event loop
+        self.http: Optional[aiohttp.ClientSession] = None
+        # Parsed playlists by M3U URL, and downloads in flight so concurrent misses share one
+        self._m3u_cache: Dict[str, M3UPlaylist] = {}
+        self._m3u_loading: Dict[str, asyncio.Task] = {}
+        # Last get_status_report() result and its time.monotonic()
+        self._status_cache: Optional[Dict] = None
+        self._status_cached_at = 0.0
+        # Bumped whenever a provider's health changes or sessions expire; a session's provider
+        # decision stays valid while the epoch it was made in is current
+        self._routing_epoch = 0
+        # Providers ordered by tier, and those sharing the lowest tier; rebuilt by load_config
+        self._providers_by_tier: List[FailoverProvider] = []
+        self._lowest_tier_providers: List[FailoverProvider] = []
         self.load_config()
     
     def load_config(self):
@@ -185,6 +446,10 @@ class IPFailoverManager:
                 )
                 self.providers[provider.name] = provider
             
+            self._providers_by_tier = sorted(self.providers.values(), key=lambda p: p.tier)
+            self._lowest_tier_providers = [p for p in self._providers_by_tier
+                                           if p.tier == self._providers_by_tier[0].tier]
+            
             logger.info(f"Loaded {len(self.providers)} failover providers")
             
         except FileNotFoundError:
@@ -241,27 +506,43 @@ class IPFailoverManager:
         logger.info(f"Created default config at {self.config_path}")
         self.load_config()
     
+    def _get_http_session(self) -> aiohttp.ClientSession:
+        """Shared upstream session, so every fetch reuses pooled keep-alive connections"""
+        if self.http is None or self.http.closed:
+            self.http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=HTTP_CONNECTION_LIMIT,
+                                               ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+                                               keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT),
+                # No overall cap: proxied streams can legitimately run for a long time
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=15, sock_read=30)
+            )
+        return self.http
+    
+    async def close(self):
+        """Stop monitoring and release the HTTP session and database connection"""
+        writer = self._db_writer_task
+        self.stop_monitoring()
+        if writer is not None:
+            await asyncio.wait({writer})  # let it flush what is still queued
+        if self.http is not None:
+            await self.http.close()
+            self.http = None
+        self.db.close()
+    
     def get_client_ip(self, request) -> str:
         """Extract client IP from request with various methods"""
         # Try different headers in order of preference
-        ip_headers = [
-            'X-Forwarded-For',
-            'X-Real-IP',
-            'X-Client-IP',
-            'CF-Connecting-IP'  # Cloudflare
-        ]
-        
-        for header in ip_headers:
-            ip = request.headers.get(header)
-            if ip:
-                # Handle comma-separated IPs (take first one)
-                ip = ip.split(',')[0].strip()
-                try:
-                    # Validate IP address
-                    ipaddress.ip_address(ip)
-                    return ip
-                except ValueError:
-                    continue
+        headers = request.headers
+        for header in _IP_HEADERS:
+            raw = headers.get(header)
+            if not raw:
+                continue
+            # Handle comma-separated IPs (take first one, without splitting the whole list)
+            comma = raw.find(',')
+            ip = (raw[:comma] if comma >= 0 else raw).strip()
+            # Validate IP address
+            if _is_ip_address(ip):
+                return ip
         
         # Fallback to remote address
         return request.remote
@@ -269,33 +550,32 @@ class IPFailoverManager:
     def determine_failover_provider(self, ip_address: str, user_id: str) -> str:
         """Determine which provider to assign to this IP/user"""
         # Check if IP already has an active session
-        if ip_address in self.active_sessions:
-            session = self.active_sessions[ip_address]
+        session = self.active_sessions.get(ip_address)
+        if session is not None:
             provider = self.providers[session.provider_name]
             
-            # Check if current provider is still healthy and has capacity
-            if (provider.health_status == "healthy" and 
-                len(provider.active_ips) <= provider.max_concurrent_ips):
+            # Reuse the last decision if nothing it depended on has changed since, or if the
+            # current provider is still healthy; either way only while it has capacity
+            if ((session.decided_at_epoch == self._routing_epoch or
+                 provider.health_status == "healthy") and
+                provider.active_ip_count <= provider.max_concurrent_ips):
                 return session.provider_name
         
         # Find best available provider
-        sorted_providers = sorted(self.providers.values(), key=lambda p: p.tier)
-        
-        for provider in sorted_providers:
+        for provider in self._providers_by_tier:
             if (provider.health_status in ["healthy", "unknown"] and
-                len(provider.active_ips) < provider.max_concurrent_ips):
+                provider.active_ip_count < provider.max_concurrent_ips):
                 return provider.name
         
         # If all providers are at capacity, use round-robin on lowest tier
-        lowest_tier_providers = [p for p in sorted_providers if p.tier == sorted_providers[0].tier]
+        lowest_tier_providers = self._lowest_tier_providers
         
         # Simple hash-based assignment for consistency
-        ip_hash = int(hashlib.md5(ip_address.encode()).hexdigest(), 16)
-        selected_provider = lowest_tier_providers[ip_hash % len(lowest_tier_providers)]
+        selected_provider = lowest_tier_providers[_bucket(ip_address, len(lowest_tier_providers))]
         
         return selected_provider.name
     
-    async def handle_stream_request(self, request) -> web.Response:
+    async def handle_stream_request(self, request) -> web.StreamResponse:
         """Handle incoming stream request with IP-based failover"""
         client_ip = self.get_client_ip(request)
         user_id = request.headers.get('X-User-ID', f'user_{client_ip}')
@@ -311,14 +591,19 @@ class IPFailoverManager:
         current_session = self.active_sessions.get(client_ip)
         if current_session and current_session.provider_name != provider_name:
             # Log failover event
-            self.db.log_failover_event(
+            self.queue_failover_event(
                 client_ip, user_id, current_session.provider_name, 
                 provider_name, "IP capacity or health-based failover"
             )
             logger.info(f"Failover: {client_ip} from {current_session.provider_name} to {provider_name}")
         
-        # Update session tracking
+        # Update session tracking; the channel history is carried over and updated in place
         now = datetime.now()
+        channels = current_session.channels_accessed if current_session else {}
+        channels.pop(channel_id, None)
+        channels[channel_id] = None
+        if len(channels) > SESSION_CHANNEL_HISTORY:
+            del channels[next(iter(channels))]
         session = IPSession(
             ip_address=client_ip,
             user_id=user_id,
@@ -326,18 +611,18 @@ class IPFailoverManager:
             failover_tier=provider.tier,
             session_start=current_session.session_start if current_session else now,
             last_activity=now,
-            channels_accessed=list(set((current_session.channels_accessed if current_session else []) + [channel_id])),
-            connection_count=(current_session.connection_count if current_session else 0) + 1
+            channels_accessed=channels,
+            connection_count=(current_session.connection_count if current_session else 0) + 1,
+            decided_at_epoch=self._routing_epoch
         )
         
-        self.active_sessions[client_ip] = session
-        provider.active_ips.add(client_ip)
-        self.db.add_session(session)
+        self._track_session(session)
+        self.queue_session_write(session)
         
         # Generate appropriate stream URL
         if provider.xtream_config:
             # Xtream API format
-            stream_url = f"{provider.xtream_config['server_url']}/live/{provider.xtream_config['username']}/{provider.xtream_config['password']}/{channel_id}.m3u8"
+            stream_url = provider.xtream_stream_url(channel_id)
         else:
             # Direct M3U format - proxy the original stream
             stream_url = await self.get_channel_stream_from_m3u(provider.m3u_url, channel_id)
@@ -347,71 +632,94 @@ class IPFailoverManager:
         
         # Proxy the stream
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(stream_url) as resp:
-                    if resp.status == 200:
-                        content = await resp.read()
-                        return web.Response(
-                            body=content,
-                            content_type=resp.content_type,
-                            headers={
-                                'X-Failover-Provider': provider_name,
-                                'X-Failover-Tier': str(provider.tier),
-                                'X-Client-IP': client_ip
-                            }
-                        )
-                    else:
-                        # Try next tier provider on failure
-                        return await self.try_failover_stream(client_ip, user_id, channel_id, provider.tier + 1)
+            async with self._get_http_session().get(stream_url) as resp:
+                if resp.status == 200:
+                    return await self._relay_stream(request, resp, {
+                        'X-Failover-Provider': provider_name,
+                        'X-Failover-Tier': str(provider.tier),
+                        'X-Client-IP': client_ip
+                    })
+                else:
+                    # Try next tier provider on failure
+                    return await self.try_failover_stream(request, client_ip, user_id, channel_id, provider.tier + 1)
         
         except Exception as e:
             logger.error(f"Stream proxy error: {e}")
-            return await self.try_failover_stream(client_ip, user_id, channel_id, provider.tier + 1)
+            return await self.try_failover_stream(request, client_ip, user_id, channel_id, provider.tier + 1)
+    
+    async def _relay_stream(self, request, upstream: aiohttp.ClientResponse,
+                            headers: Dict[str, str]) -> web.StreamResponse:
+        """Forward an upstream body to the client chunk by chunk instead of buffering it"""
+        response = web.StreamResponse(headers=headers)
+        response.content_type = upstream.content_type
+        await response.prepare(request)
+        try:
+            async for chunk in upstream.content.iter_chunked(STREAM_CHUNK_SIZE):
+                await response.write(chunk)
+            await response.write_eof()
+        except (asyncio.TimeoutError, aiohttp.ClientError, ConnectionResetError) as e:
+            # Headers are already sent, so no failover now; the truncated body ends the stream
+            logger.warning(f"Stream relay interrupted: {e!r}")
+        return response
+    
+    def _track_session(self, session: IPSession):
+        """Record the latest session for an IP, moving its slot if the provider changed"""
+        previous = self.active_sessions.get(session.ip_address)
+        if previous is None or previous.provider_name != session.provider_name:
+            if previous is not None:
+                self._adjust_ip_count(previous.provider_name, -1)
+            self._adjust_ip_count(session.provider_name, 1)
+        self.active_sessions[session.ip_address] = session
     
-    async def try_failover_stream(self, client_ip: str, user_id: str, channel_id: str, min_tier: int) -> web.Response:
+    def _adjust_ip_count(self, provider_name: str, delta: int):
+        provider = self.providers.get(provider_name)
+        if provider is not None:
+            provider.active_ip_count += delta
+    
+    async def try_failover_stream(self, request, client_ip: str, user_id: str, channel_id: str,
+                                  min_tier: int) -> web.StreamResponse:
         """Try failover to next available provider"""
-        available_providers = [p for p in self.providers.values() 
-                             if p.tier >= min_tier and p.health_status != "offline"]
+        # Already in tier order, so each candidate is tried lowest tier first
+        available_providers = [p for p in self._providers_by_tier
+                               if p.tier >= min_tier and p.health_status != "offline"]
         
         if not available_providers:
             return web.Response(status=503, text="No available providers")
         
-        # Sort by tier and try each one
-        available_providers.sort(key=lambda p: p.tier)
-        
         for provider in available_providers:
             try:
                 if provider.xtream_config:
-                    stream_url = f"{provider.xtream_config['server_url']}/live/{provider.xtream_config['username']}/{provider.xtream_config['password']}/{channel_id}.m3u8"
+                    stream_url = provider.xtream_stream_url(channel_id)
                 else:
                     stream_url = await self.get_channel_stream_from_m3u(provider.m3u_url, channel_id)
                 
                 if stream_url:
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(stream_url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
-                            if resp.status == 200:
-                                # Update session to use this provider
-                                self.active_sessions[client_ip].provider_name = provider.name
-                                self.active_sessions[client_ip].failover_tier = provider.tier
-                                provider.active_ips.add(client_ip)
-                                
-                                # Log successful failover
-                                self.db.log_failover_event(
-                                    client_ip, user_id, "failed_provider", 
-                                    provider.name, f"Automatic failover to tier {provider.tier}"
-                                )
-                                
-                                content = await resp.read()
-                                return web.Response(
-                                    body=content,
-                                    content_type=resp.content_type,
-                                    headers={
-                                        'X-Failover-Provider': provider.name,
-                                        'X-Failover-Tier': str(provider.tier),
-                                        'X-Client-IP': client_ip,
-                                        'X-Failover-Used': 'true'
-                                    }
-                                )
+                    # Fail over quickly if the provider can't be reached, but don't cap
+                    # the relayed stream's total length
+                    async with self._get_http_session().get(
+                            stream_url, timeout=aiohttp.ClientTimeout(total=None, sock_connect=10,
+                                                                      sock_read=30)) as resp:
+                        if resp.status == 200:
+                            # Update session to use this provider
+                            session = self.active_sessions[client_ip]
+                            if session.provider_name != provider.name:
+                                self._adjust_ip_count(session.provider_name, -1)
+                                self._adjust_ip_count(provider.name, 1)
+                            session.provider_name = provider.name
+                            session.failover_tier = provider.tier
+                            
+                            # Log successful failover
+                            self.queue_failover_event(
+                                client_ip, user_id, "failed_provider", 
+                                provider.name, f"Automatic failover to tier {provider.tier}"
+                            )
+                            
+                            return await self._relay_stream(request, resp, {
+                                'X-Failover-Provider': provider.name,
+                                'X-Failover-Tier': str(provider.tier),
+                                'X-Client-IP': client_ip,
+                                'X-Failover-Used': 'true'
+                            })
             
             except Exception as e:
                 logger.warning(f"Failover attempt failed for provider {provider.name}: {e}")
@@ -421,27 +729,56 @@ class IPFailoverManager:
     
     async def get_channel_stream_from_m3u(self, m3u_url: str, channel_id: str) -> Optional[str]:
         """Extract specific channel stream URL from M3U playlist"""
+        playlist = await self._get_m3u_playlist(m3u_url)
+        if playlist is None:
+            return None
+        
+        stream_url = playlist.channels.get(channel_id)
+        if stream_url is not None:
+            return stream_url
+        
+        # Not a tvg-id or channel name: match anywhere in the #EXTINF line. channel_id comes
+        # straight from the request, so scan results are kept in a bounded LRU
+        resolved = playlist.resolved
+        if channel_id in resolved:
+            resolved.move_to_end(channel_id)
+            stream_url = resolved[channel_id]
+        else:
+            stream_url = next((url for extinf, url in playlist.entries if channel_id in extinf), None)
+            resolved[channel_id] = stream_url
+            if len(resolved) > M3U_RESOLVED_CACHE_SIZE:
+                resolved.popitem(last=False)
+        
+        # If channel_id not found, try to match by line number or other criteria
+        # This is a fallback - you might need to adjust based on your M3U format
+        if stream_url is None and playlist.streams:
+            # Use hash of channel_id to select a stream (cheap, so never stored)
+            stream_url = playlist.streams[_bucket(channel_id, len(playlist.streams))]
+        
+        return stream_url
+    
+    async def _get_m3u_playlist(self, m3u_url: str) -> Optional[M3UPlaylist]:
+        """Cached playlist for m3u_url, downloaded at most once per M3U_CACHE_TTL"""
+        playlist = self._m3u_cache.get(m3u_url)
+        if playlist is not None and time.monotonic() - playlist.fetched_at < M3U_CACHE_TTL:
+            return playlist
+        
+        task = self._m3u_loading.get(m3u_url)
+        if task is None:
+            task = self._m3u_loading[m3u_url] = asyncio.create_task(self._load_m3u(m3u_url))
+            task.add_done_callback(lambda _: self._m3u_loading.pop(m3u_url, None))
+        return await asyncio.shield(task)
+    
+    async def _load_m3u(self, m3u_url: str) -> Optional[M3UPlaylist]:
+        """Download and index a playlist; None (and nothing cached) on failure"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(m3u_url) as resp:
-                    if resp.status == 200:
-                        content = await resp.text()
-                        lines = content.split('\n')
-                        
-                        for i, line in enumerate(lines):
-                            if line.startswith('#EXTINF:') and channel_id in line:
-                                # Next line should be the stream URL
-                                if i + 1 < len(lines):
-                                    return lines[i + 1].strip()
-                        
-                        # If channel_id not found, try to match by line number or other criteria
-                        # This is a fallback - you might need to adjust based on your M3U format
-                        stream_lines = [line.strip() for line in lines if line.strip() and not line.startswith('#')]
-                        if stream_lines:
-                            # Use hash of channel_id to select a stream
-                            channel_hash = int(hashlib.md5(channel_id.encode()).hexdigest(), 16)
-                            selected_stream = stream_lines[channel_hash % len(stream_lines)]
-                            return selected_stream
+            async with self._get_http_session().get(m3u_url) as resp:
+                if resp.status == 200:
+                    content = await resp.text()
+                    # Playlists can run to hundreds of MB; index them off the event loop
+                    playlist = await asyncio.to_thread(M3UPlaylist.parse, content)
+                    self._m3u_cache[m3u_url] = playlist
+                    return playlist
         
         except Exception as e:
             logger.error(f"Failed to fetch M3U playlist {m3u_url}: {e}")
@@ -449,37 +786,129 @@ class IPFailoverManager:
         return None
     
     async def health_check_providers(self):
-        """Perform health checks on all providers"""
-        for provider in self.providers.values():
-            try:
-                start_time = time.time()
+        """Perform health checks on all providers (concurrently; one slow provider doesn't delay the rest)"""
+        results = await asyncio.gather(*(self._check_provider_health(provider)
+                                         for provider in self.providers.values()),
+                                       return_exceptions=True)
+        
+        self._status_cache = None
+        
+        # One upsert per cycle for every provider, written alongside the queued sessions
+        health_rows = [row for row in results if isinstance(row, tuple)]
+        if health_rows:
+            self.queue_health_rows(health_rows)
+    
+    async def _check_provider_health(self, provider: FailoverProvider) -> Tuple:
+        """Check one provider, update its health status in place and return its provider_health row"""
+        try:
+            start_time = time.time()
+            
+            if provider.xtream_config:
+                # Check Xtream API health
+                health_url = f"{provider.xtream_config['server_url']}/player_api.php?username={provider.xtream_config['username']}&password={provider.xtream_config['password']}&action=get_live_categories"
+            else:
+                # Check M3U availability
+                health_url = provider.m3u_url
+            
+            async with self._get_http_session().get(
+                    health_url, timeout=aiohttp.ClientTimeout(total=30)) as resp:
+                response_time = int((time.time() - start_time) * 1000)
                 
-                if provider.xtream_config:
-                    # Check Xtream API health
-                    health_url = f"{provider.xtream_config['server_url']}/player_api.php?username={provider.xtream_config['username']}&password={provider.xtream_config['password']}&action=get_live_categories"
+                if resp.status == 200:
+                    self._set_health_status(provider, "healthy")
+                elif resp.status in [502, 503, 504]:
+                    self._set_health_status(provider, "degraded")
                 else:
-                    # Check M3U availability
-                    health_url = provider.m3u_url
+                    self._set_health_status(provider, "offline")
+                    self._m3u_cache.pop(provider.m3u_url, None)
                 
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(health_url, timeout=aiohttp.ClientTimeout(total=30)) as resp:
-                        response_time = int((time.time() - start_time) * 1000)
-                        
-                        if resp.status == 200:
-                            provider.health_status = "healthy"
-                        elif resp.status in [502, 503, 504]:
-                            provider.health_status = "degraded"
-                        else:
-                            provider.health_status = "offline"
-                        
-                        provider.last_health_check = datetime.now()
-                        
-                        logger.info(f"Provider {provider.name}: {provider.health_status} ({response_time}ms)")
-            
-            except Exception as e:
-                provider.health_status = "offline"
                 provider.last_health_check = datetime.now()
-                logger.error(f"Health check failed for {provider.name}: {e}")
+                
+                logger.info(f"Provider {provider.name}: {provider.health_status} ({response_time}ms)")
+                return (provider.name, provider.tier, provider.health_status,
+                        provider.last_health_check, response_time, int(resp.status != 200))
+        
+        except Exception as e:
+            self._set_health_status(provider, "offline")
+            provider.last_health_check = datetime.now()
+            self._m3u_cache.pop(provider.m3u_url, None)
+            logger.error(f"Health check failed for {provider.name}: {e}")
+            return (provider.name, provider.tier, provider.health_status,
+                    provider.last_health_check, None, 1)
+    
+    def _set_health_status(self, provider: FailoverProvider, status: str):
+        if provider.health_status != status:
+            provider.health_status = status
+            self._routing_epoch += 1
+    
+    def queue_session_write(self, session: IPSession):
+        """Persist a session in the background instead of blocking the request on SQLite"""
+        self._queue_write(session)
+    
+    def queue_failover_event(self, ip_address: str, user_id: str, from_provider: str,
+                             to_provider: str, reason: str):
+        """Log a failover event in the background, in the same transaction as queued sessions"""
+        self._queue_write((ip_address, user_id, from_provider, to_provider, reason))
+    
+    def queue_health_rows(self, rows: List[Tuple]):
+        """Upsert a health-check cycle's provider rows in the background, as one batch"""
+        self._queue_write(rows)
+    
+    def _queue_write(self, item):
+        if self._db_writer_task is None or self._db_writer_task.done():
+            self._db_writer_task = asyncio.create_task(self._db_writer())
+        self._write_queue.put_nowait(item)
+    
+    async def _db_writer(self):
+        """Drain the write queue in batches: latest state per IP, every failover event and health row"""
+        loop = asyncio.get_running_loop()
+        sessions: Dict[str, IPSession] = {}
+        events: List[Tuple[str, str, str, str, str]] = []
+        health_rows: List[Tuple] = []
+        
+        def collect(item):
+            if isinstance(item, IPSession):
+                sessions[item.ip_address] = item
+            elif isinstance(item, list):
+                # A whole health-check cycle, queued as one item
+                health_rows.extend(item)
+            else:
+                events.append(item)
+        
+        try:
+            while True:
+                collect(await self._write_queue.get())
+                deadline = loop.time() + SESSION_FLUSH_INTERVAL
+                while len(sessions) + len(events) < SESSION_FLUSH_BATCH:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        collect(await asyncio.wait_for(self._write_queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                
+                # Rows are built here on the event loop, which owns the session objects;
+                # only the SQLite write moves to a worker thread
+                rows = [self.db.session_row(session) for session in sessions.values()]
+                batch_events = events[:]
+                batch_health = health_rows[:]
+                sessions.clear()
+                events.clear()
+                health_rows.clear()
+                try:
+                    await asyncio.to_thread(self.db.write_batch, rows, batch_events, batch_health)
+                except Exception as e:
+                    logger.error(f"Failed to persist {len(rows)} sessions, {len(batch_events)} "
+                                 f"failover events and {len(batch_health)} health rows: {e}")
+        except asyncio.CancelledError:
+            # Shutting down: write whatever is still queued before exiting
+            while not self._write_queue.empty():
+                collect(self._write_queue.get_nowait())
+            if sessions or events or health_rows:
+                self.db.write_batch([self.db.session_row(session) for session in sessions.values()],
+                                    events, health_rows)
+            raise
     
     async def cleanup_expired_sessions(self):
         """Clean up expired IP sessions"""
@@ -490,12 +919,14 @@ class IPFailoverManager:
             if session.last_activity < cutoff_time:
                 expired_ips.append(ip)
                 
-                # Remove IP from provider's active set
-                if session.provider_name in self.providers:
-                    self.providers[session.provider_name].active_ips.discard(ip)
+                # Release the IP's slot on its provider
+                self._adjust_ip_count(session.provider_name, -1)
         
         for ip in expired_ips:
             del self.active_sessions[ip]
+        if expired_ips:
+            self._routing_epoch += 1  # freed capacity may change earlier decisions
+        self._status_cache = None
         
         if expired_ips:
             logger.info(f"Cleaned up {len(expired_ips)} expired sessions")
@@ -523,30 +954,39 @@ class IPFailoverManager:
     def stop_monitoring(self):
         """Stop background monitoring"""
         self.monitoring_active = False
+        if self._db_writer_task is not None:
+            self._db_writer_task.cancel()
+            self._db_writer_task = None
         logger.info("Stopped IP failover monitoring")
     
     def get_status_report(self) -> Dict:
-        """Get comprehensive status report"""
-        active_sessions = self.db.get_active_sessions()
+        """Get comprehensive status report (cached for STATUS_CACHE_SECONDS)"""
+        now = time.monotonic()
+        if self._status_cache is None or now - self._status_cached_at >= STATUS_CACHE_SECONDS:
+            self._status_cache = self._build_status_report()
+            self._status_cached_at = now
+        return self._status_cache
+    
+    def _build_status_report(self) -> Dict:
+        session_counts = self.db.count_sessions_by_provider()
         
         provider_stats = {}
         for name, provider in self.providers.items():
             provider_stats[name] = {
                 'tier': provider.tier,
                 'health_status': provider.health_status,
-                'active_ips': len(provider.active_ips),
+                'active_ips': provider.active_ip_count,
                 'max_concurrent_ips': provider.max_concurrent_ips,
                 'last_health_check': provider.last_health_check.isoformat() if provider.last_health_check else None
             }
         
         return {
-            'total_active_sessions': len(active_sessions),
+            'total_active_sessions': sum(session_counts.values()),
             'total_providers': len(self.providers),
             'healthy_providers': len([p for p in self.providers.values() if p.health_status == "healthy"]),
             'provider_stats': provider_stats,
             'active_sessions_by_provider': {
-                name: len([s for s in active_sessions if s.provider_name == name])
-                for name in self.providers.keys()
+                name: session_counts.get(name, 0) for name in self.providers
             }
         }
 
@@ -558,17 +998,28 @@ async def create_failover_app(manager: IPFailoverManager) -> web.Application:
         return await manager.handle_stream_request(request)
     
     async def handle_status(request):
-        status = manager.get_status_report()
-        return web.json_response(status)
+        # May query SQLite when the cached report has expired
+        status = await asyncio.to_thread(manager.get_status_report)
+        return _json_response(status)
     
     async def handle_sessions(request):
-        sessions = manager.db.get_active_sessions()
-        sessions_data = [asdict(session) for session in sessions]
-        # Convert datetime objects to strings
-        for session_data in sessions_data:
-            session_data['session_start'] = session_data['session_start'].isoformat()
-            session_data['last_activity'] = session_data['last_activity'].isoformat()
-        return web.json_response(sessions_data)
+        # Straight from the stored rows: no IPSession objects, and the stored timestamp
+        # text only needs its separator switched to match datetime.isoformat()
+        rows = await asyncio.to_thread(manager.db.get_active_session_rows)
+        return _json_response([
+            {
+                'ip_address': ip_address,
+                'user_id': user_id,
+                'provider_name': provider_name,
+                'failover_tier': failover_tier,
+                'session_start': session_start.replace(' ', 'T', 1),
+                'last_activity': last_activity.replace(' ', 'T', 1),
+                'channels_accessed': _json_fragment(channels_accessed or "[]"),
+                'connection_count': connection_count
+            }
+            for (ip_address, user_id, provider_name, failover_tier, session_start,
+                 last_activity, channels_accessed, connection_count) in rows
+        ])
     
     app = web.Application()
     app.router.add_get('/stream/{channel_id}', handle_stream)
@@ -604,8 +1055,8 @@ async def main():
         await monitoring_task
     except KeyboardInterrupt:
         logger.info("Shutting down...")
-        manager.stop_monitoring()
         await runner.cleanup()
+        await manager.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
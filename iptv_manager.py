@@ -14,12 +14,16 @@ import argparse
 import requests
 import re
 import json
+import copy
+import functools
+import itertools
+import multiprocessing
 import subprocess
 import hashlib
+import io
 import logging
-import xml.etree.ElementTree as ET
 from datetime import datetime
-from collections import defaultdict
+from collections import defaultdict, deque
 import shutil
 import psutil
 import socket
@@ -43,9 +47,21 @@ except ImportError:
     redis = None
 
 try:
-    from concurrent.futures import ThreadPoolExecutor
+    import xxhash
 except ImportError:
-    ThreadPoolExecutor = None
+    xxhash = None
+
+try:
+    from lxml import etree as ET
+    LXML_AVAILABLE = True
+except ImportError:
+    import xml.etree.ElementTree as ET
+    LXML_AVAILABLE = False
+
+try:
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = ProcessPoolExecutor = None
 try:
     from flask import Flask, render_template_string, jsonify, request, send_from_directory
     FLASK_AVAILABLE = True
@@ -74,6 +90,34 @@ MAX_CONCURRENT_DOWNLOADS = 5
 CACHE_TTL = 3600  # 1 hour in seconds
 MAX_FILENAME_LENGTH = 200
 CHUNK_SIZE = 8192  # For streaming downloads
+HASH_CHUNK_SIZE = 1024 * 1024  # For hashing the proxy M3U; big reads keep per-chunk overhead negligible
+M3U_IO_BUFFER = 1024 * 1024  # For streaming the playlist to disk and reading it back during an update
+CONTENT_ID_CACHE_SIZE = 65536  # Names remembered by create_content_id; repeats across streams/providers are common
+M3U_SHARD_SIZE = 2 * 1024 * 1024  # Characters per shard; larger playlists are parsed across worker processes
+
+# Patterns used per playlist entry, compiled once
+_TVG_ID_RE = re.compile(r'tvg-id="([^"]*)"')
+_TVG_LOGO_RE = re.compile(r'tvg-logo="([^"]*)"')
+_GROUP_TITLE_RE = re.compile(r'group-title="([^"]*)"')
+_WHITESPACE_RE = re.compile(r'\s+')
+_NON_WORD_RE = re.compile(r'[^\w\s]')
+# Quality/type indicators that vary between providers, removed in one pass
+_CONTENT_ID_TAGS_RE = re.compile(r'\b(?:hd|fhd|uhd|4k|sd|live|tv|fr|us|uk)\b')
+# Path separators, characters unsafe in filenames and control characters
+_UNSAFE_FILENAME_RE = re.compile(r'[/\\*?"<>|:.\x00-\x1f\x7f-\x9f]')
+_CATEGORY_NAME_RE = re.compile(r'^[a-zA-Z0-9_\-\s]+$')
+# Category keywords, one alternation per category, matched against lowercased names/groups
+_CATCHUP_RE = re.compile(r'catchup|timeshift|replay')
+_MOVIE_RE = re.compile(r'movie|film|cinema|vod')
+_SERIES_RE = re.compile(r'series|tv show|season|s01|s02|episode|e01|e02')
+# Resolution keywords per rank, checked from best to worst; the first tier that matches wins
+_RESOLUTION_RANKS = (
+    (re.compile(r'4k|uhd|2160'), 5),
+    (re.compile(r'1080|fhd'), 4),
+    (re.compile(r'720|hd'), 3),
+    (re.compile(r'576|sd'), 2),
+    (re.compile(r'low|360'), 1),
+)
 
 # --- Logging Setup ---
 try:
@@ -95,6 +139,181 @@ except PermissionError:
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=CONTENT_ID_CACHE_SIZE)
+def _content_id(name):
+    """Deduplication ID for a channel name, shared by every converter in the process."""
+    # Normalize name: lowercase, remove special chars, spaces
+    normalized = _WHITESPACE_RE.sub(' ', name.lower())
+    normalized = _NON_WORD_RE.sub('', normalized).strip()
+    # Remove common quality/type indicators that vary between providers
+    normalized = _CONTENT_ID_TAGS_RE.sub('', normalized)
+    normalized = _WHITESPACE_RE.sub(' ', normalized).strip()
+    # Use a hash for a short, consistent ID; 64 bits is plenty for a per-run dedupe key
+    return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest()
+
+
+def _resolution_rank(name):
+    """Assign a numerical rank to a stream based on resolution keywords in its name."""
+    name_lower = name.lower()
+    for keywords, rank in _RESOLUTION_RANKS:
+        if keywords.search(name_lower):
+            return rank
+    return 0 # Default/Unknown
+
+
+def _parse_extinf_line(line):
+    """Parse an #EXTINF line to extract name, group, EPG ID, and logo."""
+    info = {'name': '', 'group': '', 'epg_id': '', 'logo': ''}
+    try:
+        # Name is the part after the last comma
+        main_part, name_part = line.rsplit(',', 1)
+        info['name'] = name_part.strip()
+
+        # Extract attributes using regex for reliability
+        tvg_id = _TVG_ID_RE.search(main_part)
+        if tvg_id: info['epg_id'] = tvg_id.group(1)
+
+        tvg_logo = _TVG_LOGO_RE.search(main_part)
+        if tvg_logo: info['logo'] = tvg_logo.group(1)
+
+        group_title = _GROUP_TITLE_RE.search(main_part)
+        if group_title: info['group'] = group_title.group(1)
+
+    except ValueError:
+        # Fallback for lines without a comma
+        info['name'] = line.strip()
+    except Exception as e:
+        logger.warning(f"Error parsing EXTINF line: {e}")
+        info['name'] = "Unknown Channel"
+    return info
+
+
+def _categorize_content(name, group_title=""):
+    """Smart categorization of content (Movies, Series, Live, Catchup)."""
+    if not name:
+        return 'Live'  # Default fallback
+
+    name_lower = name.lower()
+    group_lower = group_title.lower() if group_title else ""
+
+    # Check group title first for explicit categorization
+    if group_lower:
+        if _CATCHUP_RE.search(group_lower):
+            return 'Catchup'
+        if _MOVIE_RE.search(group_lower):
+            return 'Movies'
+        if _SERIES_RE.search(group_lower):
+            return 'Series'
+
+    # Then check channel name
+    if _MOVIE_RE.search(name_lower):
+        return 'Movies'
+    if _SERIES_RE.search(name_lower):
+        return 'Series'
+
+    # Default to Live TV if no other category matches
+    return 'Live'
+
+
+def _iter_m3u_entries(m3u_content, group_filters, channel_mapping):
+    """Scan M3U content once, yielding (category, content_id, info, stream_url) per kept entry.
+
+    m3u_content is the playlist text or an open text file. Lines are read lazily, so the
+    playlist is never split into a list of lines.
+    """
+    # Settings are fixed for the whole playlist: resolve the filter to a set lookup and
+    # bind the per-entry helpers to locals once instead of on every line
+    filter_mode = group_filters.get('mode', 'exclude')
+    filter_groups = frozenset(group_filters.get('groups', []))
+    exclude = filter_mode == 'exclude' and bool(filter_groups)
+    include = filter_mode == 'include'
+    parse_extinf_line = _parse_extinf_line
+    categorize_content = _categorize_content
+    create_content_id = _content_id
+    current_info = {}
+
+    lines = io.StringIO(m3u_content) if isinstance(m3u_content, str) else m3u_content
+    for line in lines:
+        line = line.strip()
+        if line.startswith('#EXTINF'):
+            current_info = parse_extinf_line(line)
+        elif line and not line.startswith('#'):
+            stream_url = line
+            if not current_info or not current_info.get('name'):
+                continue # Skip if there's no preceding #EXTINF info
+
+            # Apply channel mapping
+            original_name = current_info['name']
+            if original_name in channel_mapping:
+                mapping = channel_mapping[original_name]
+                current_info['name'] = mapping.get('name', original_name)
+                current_info['group'] = mapping.get('group', current_info['group'])
+                current_info['logo'] = mapping.get('logo', current_info['logo'])
+
+            # Apply group filters
+            group = current_info.get('group', 'Uncategorized')
+            if (exclude and group in filter_groups) or (include and group not in filter_groups):
+                continue
+
+            category = categorize_content(current_info['name'], group)
+            content_id = create_content_id(current_info['name'])
+            yield category, content_id, current_info, stream_url
+
+            current_info = {}
+
+
+def _merge_m3u_entries_serial(all_content, m3u_content, provider, group_filters,
+                              channel_mapping, tag_category=False):
+    """Parse and merge into {category: {content_id: channel}} in the current process; returns all_content."""
+    provider_name = provider['name']
+    for category, content_id, info, stream_url in _iter_m3u_entries(
+            m3u_content, group_filters, channel_mapping):
+        stream_details = {
+            'url': stream_url,
+            'provider': provider_name,
+            'resolution_rank': _resolution_rank(info['name'])
+        }
+
+        channels = all_content.get(category)
+        if channels is None:
+            channels = all_content[category] = {}
+        channel = channels.get(content_id)
+        if channel is None:
+            channel = channels[content_id] = {
+                'name': info['name'],
+                'group': info.get('group', 'Uncategorized'),
+                'epg_id': info['epg_id'],
+                'logo': info['logo'],
+                'streams': [],
+                'providers': []
+            }
+            if tag_category:
+                channel['provider'] = provider_name
+                channel['category'] = category
+
+        channel['streams'].append(stream_details)
+        if provider_name not in channel['providers']:
+            channel['providers'].append(provider_name)
+    return all_content
+
+
+# Process pool for parsing large playlists, shared by every converter and thread in the
+# process. Workers are started with forkserver/spawn: callers run on asyncio.to_thread
+# worker threads, and forking a multithreaded process can deadlock the child.
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+
+def _get_parse_pool():
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _parse_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                              mp_context=multiprocessing.get_context(method))
+        return _parse_pool
+
+
 # --- Core Converter Class ---
 class MultiProviderM3UConverter:
     """Handles the core logic of downloading, merging, and converting M3U playlists."""
@@ -172,6 +391,10 @@ class MultiProviderM3UConverter:
             logger.warning("No enabled EPG sources found.")
             return []
 
+        if aiohttp:
+            # Fetch every source at once so the total wait is the slowest source, not the sum
+            return asyncio.run(self._download_epg_async(enabled_sources))
+
         for i, source in enumerate(enabled_sources):
             url = source.get('url')
             if not url: continue
@@ -190,6 +413,60 @@ class MultiProviderM3UConverter:
         
         return downloaded_files
 
+    async def _download_epg_async(self, enabled_sources):
+        """Download EPG sources concurrently over one connection pool, keeping source order."""
+        connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT_DOWNLOADS, ssl=False)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            results = await asyncio.gather(*(self._fetch_epg(session, i, source['url'])
+                                             for i, source in enumerate(enabled_sources)
+                                             if source.get('url')))
+        return [path for path in results if path]
+
+    async def _fetch_epg(self, session, i, url):
+        """Download one EPG source to its temporary file; returns the path, or None on failure."""
+        logger.info(f"Downloading EPG from: {url}")
+        try:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=60)) as response:
+                response.raise_for_status()
+                data = await response.read()
+            temp_epg_path = os.path.join(self.base_dir, f"temp_epg_{i}.xml")
+            await asyncio.to_thread(self._write_bytes, temp_epg_path, data)
+            logger.info(f"Temporary EPG data saved to {temp_epg_path}")
+            return temp_epg_path
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            logger.error(f"Failed to download EPG data from {url}: {e}")
+            return None
+
+    @staticmethod
+    def _write_bytes(path, data):
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def _iter_epg_elements(self, file_path):
+        """Stream the <channel>/<programme> elements of an EPG file without keeping the whole tree.
+
+        Each element is released from the parse tree once the caller is done with it, so
+        anything the caller wants to keep must be copied or moved into another tree.
+        """
+        if LXML_AVAILABLE:
+            for _, elem in ET.iterparse(file_path, events=('end',), tag=('channel', 'programme'),
+                                        huge_tree=True, remove_blank_text=True):
+                # Only drop siblings already handed out: lxml reads ahead, so later siblings may
+                # be parsed already and must stay attached until they are yielded
+                parent = elem.getparent()
+                while elem.getprevious() is not None:
+                    del parent[0]
+                yield elem
+                if elem.getparent() is parent:
+                    elem.clear()
+        else:
+            context = ET.iterparse(file_path, events=('start', 'end'))
+            _, root = next(context)
+            for event, elem in context:
+                if event == 'end' and elem.tag in ('channel', 'programme'):
+                    yield elem
+                    root.clear()
+
     def _merge_epg_files(self, epg_files):
         """Merge multiple EPG XML files into one, removing duplicates."""
         if not epg_files:
@@ -204,19 +481,16 @@ class MultiProviderM3UConverter:
 
         for file_path in epg_files:
             try:
-                tree = ET.parse(file_path)
-                root = tree.getroot()
-
-                for channel in root.findall('channel'):
-                    channel_id = channel.get('id')
-                    if channel_id and channel_id not in merged_channels:
-                        merged_channels[channel_id] = channel
-
-                for programme in root.findall('programme'):
-                    prog_key = (programme.get('channel'), programme.get('start'), programme.get('stop'))
-                    if prog_key not in merged_programmes:
-                        merged_programmes.add(prog_key)
-                        merged_root.append(programme)
+                for elem in self._iter_epg_elements(file_path):
+                    if elem.tag == 'channel':
+                        channel_id = elem.get('id')
+                        if channel_id and channel_id not in merged_channels:
+                            merged_channels[channel_id] = copy.deepcopy(elem)
+                    else:
+                        prog_key = (elem.get('channel'), elem.get('start'), elem.get('stop'))
+                        if prog_key not in merged_programmes:
+                            merged_programmes.add(prog_key)
+                            merged_root.append(elem)
 
             except ET.ParseError as e:
                 logger.error(f"Failed to parse EPG file {file_path}: {e}")
@@ -231,13 +505,27 @@ class MultiProviderM3UConverter:
         final_epg_path = os.path.join(self.base_dir, self.epg_file)
         tree = ET.ElementTree(merged_root)
         try:
-            tree.write(final_epg_path, encoding='UTF-8', xml_declaration=True)
+            if LXML_AVAILABLE:
+                tree.write(final_epg_path, encoding='UTF-8', xml_declaration=True, pretty_print=False)
+            else:
+                tree.write(final_epg_path, encoding='UTF-8', xml_declaration=True)
             logger.info(f"Successfully merged EPG data to {final_epg_path}")
         except Exception as e:
             logger.error(f"Failed to write merged EPG file: {e}")
 
     def download_m3u(self, provider_name, max_retries=3):
         """Download M3U content ONLY through proxy - no direct connections."""
+        return self._download_m3u(provider_name, max_retries)
+
+    def download_m3u_to_file(self, provider_name, dest_path, max_retries=3):
+        """Stream the proxy M3U straight to dest_path, so it never has to exist as one string.
+
+        Returns dest_path, or None if the download failed.
+        """
+        return self._download_m3u(provider_name, max_retries, dest_path)
+
+    def _download_m3u(self, provider_name, max_retries, dest_path=None):
+        """Fetch the proxy M3U with retries; returns its text, or dest_path when streaming to disk."""
         config = self.load_config()
         proxy_settings = config.get('proxy_settings', {})
         
@@ -258,16 +546,32 @@ class MultiProviderM3UConverter:
                     proxy_url, 
                     timeout=self.request_timeout, 
                     verify=self.ssl_verify, 
-                    headers=headers
+                    headers=headers,
+                    stream=dest_path is not None
                 )
                 response.raise_for_status()
                 
-                # Validate response content
-                if not response.text or len(response.text.strip()) < 10:
+                if dest_path is None:
+                    # Validate response content
+                    if not response.text or len(response.text.strip()) < 10:
+                        raise ValueError("Empty or invalid M3U response")
+                    
+                    logger.info(f"Successfully downloaded M3U for {provider_name} through proxy.")
+                    return response.text
+                
+                # Keep only the start of the body for validation; anything longer than this
+                # can't be mostly whitespace in a real playlist
+                head = b''
+                with open(dest_path, 'wb', buffering=M3U_IO_BUFFER) as f:
+                    for chunk in response.iter_content(chunk_size=M3U_IO_BUFFER):
+                        f.write(chunk)
+                        if len(head) < 64:
+                            head += chunk[:64]
+                if len(head) < 64 and len(head.strip()) < 10:
                     raise ValueError("Empty or invalid M3U response")
                 
                 logger.info(f"Successfully downloaded M3U for {provider_name} through proxy.")
-                return response.text
+                return dest_path
                 
             except requests.exceptions.Timeout as e:
                 logger.warning(f"Timeout on attempt {attempt + 1}/{max_retries} for {provider_name}: {e}")
@@ -296,145 +600,123 @@ class MultiProviderM3UConverter:
                     time.sleep(2 ** attempt)
         
         logger.error(f"Failed to download M3U for {provider_name} after {max_retries} attempts")
+        if dest_path and os.path.exists(dest_path):
+            os.remove(dest_path) # Don't leave a partial playlist behind
         return None
 
     def create_content_id(self, name):
-        """Create a unique but consistent content ID for deduplication."""
-        # Normalize name: lowercase, remove special chars, spaces
-        normalized = re.sub(r'\s+', ' ', name.lower())
-        normalized = re.sub(r'[^\w\s]', '', normalized).strip()
-        # Remove common quality/type indicators that vary between providers
-        tags_to_remove = ['hd', 'fhd', 'uhd', '4k', 'sd', 'live', 'tv', 'fr', 'us', 'uk']
-        for tag in tags_to_remove:
-            normalized = re.sub(f'\\b{tag}\\b', '', normalized)
-        normalized = re.sub(r'\s+', ' ', normalized).strip()
-        # Use a hash for a short, consistent ID
-        return hashlib.md5(normalized.encode()).hexdigest()
+        """Create a unique but consistent content ID for deduplication (memoized per name)."""
+        return _content_id(name)
 
     def _get_resolution_rank(self, name):
         """Assign a numerical rank to a stream based on resolution keywords in its name."""
-        name_lower = name.lower()
-        if any(kw in name_lower for kw in ['4k', 'uhd', '2160']): return 5
-        if any(kw in name_lower for kw in ['1080', 'fhd']): return 4
-        if any(kw in name_lower for kw in ['720', 'hd']): return 3
-        if any(kw in name_lower for kw in ['576', 'sd']): return 2
-        if any(kw in name_lower for kw in ['low', '360']): return 1
-        return 0 # Default/Unknown
+        return _resolution_rank(name)
 
     def _parse_extinf_line(self, line):
         """Parse an #EXTINF line to extract name, group, EPG ID, and logo."""
-        info = {'name': '', 'group': '', 'epg_id': '', 'logo': ''}
-        try:
-            # Name is the part after the last comma
-            main_part, name_part = line.rsplit(',', 1)
-            info['name'] = name_part.strip()
-
-            # Extract attributes using regex for reliability
-            tvg_id = re.search(r'tvg-id="([^"]*)"', main_part)
-            if tvg_id: info['epg_id'] = tvg_id.group(1)
-
-            tvg_logo = re.search(r'tvg-logo="([^"]*)"', main_part)
-            if tvg_logo: info['logo'] = tvg_logo.group(1)
-
-            group_title = re.search(r'group-title="([^"]*)"', main_part)
-            if group_title: info['group'] = group_title.group(1)
-
-        except ValueError:
-            # Fallback for lines without a comma
-            info['name'] = line.strip()
-        except Exception as e:
-            logger.warning(f"Error parsing EXTINF line: {e}")
-            info['name'] = "Unknown Channel"
-        return info
+        return _parse_extinf_line(line)
 
     def categorize_content(self, name, group_title=""):
         """Smart categorization of content (Movies, Series, Live, Catchup)."""
-        if not name:
-            return 'Live'  # Default fallback
-            
-        name_lower = name.lower()
-        group_lower = group_title.lower() if group_title else ""
+        return _categorize_content(name, group_title)
 
-        # Keywords for categorization
-        catchup_kw = ['catchup', 'timeshift', 'replay']
-        movie_kw = ['movie', 'film', 'cinema', 'vod']
-        series_kw = ['series', 'tv show', 'season', 's01', 's02', 'episode', 'e01', 'e02']
+    def iter_m3u_entries(self, m3u_content, group_filters, channel_mapping):
+        """Scan M3U content once, yielding (category, content_id, info, stream_url) per kept entry.
 
-        # Check group title first for explicit categorization
-        if group_lower and any(kw in group_lower for kw in catchup_kw):
-            return 'Catchup'
-        if group_lower and any(kw in group_lower for kw in movie_kw):
-            return 'Movies'
-        if group_lower and any(kw in group_lower for kw in series_kw):
-            return 'Series'
-
-        # Then check channel name
-        if any(kw in name_lower for kw in movie_kw):
-            return 'Movies'
-        if any(kw in name_lower for kw in series_kw):
-            return 'Series'
-
-        # Default to Live TV if no other category matches
-        return 'Live'
+        m3u_content is the playlist text or an open text file, read lazily line by line.
+        """
+        return _iter_m3u_entries(m3u_content, group_filters, channel_mapping)
 
     def parse_m3u_content(self, m3u_content, provider, group_filters, channel_mapping):
         """Parse M3U content, apply filters, and categorize into a structured dictionary."""
-        all_content = defaultdict(lambda: defaultdict(dict))
-        lines = m3u_content.strip().split('\n')
-        current_info = {}
-
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if line.startswith('#EXTINF'):
-                current_info = self._parse_extinf_line(line)
-            elif line and not line.startswith('#'):
-                stream_url = line
-                if not current_info or not current_info.get('name'):
-                    continue # Skip if there's no preceding #EXTINF info
-
-                # Apply channel mapping
-                original_name = current_info['name']
-                if original_name in channel_mapping:
-                    mapping = channel_mapping[original_name]
-                    current_info['name'] = mapping.get('name', original_name)
-                    current_info['group'] = mapping.get('group', current_info['group'])
-                    current_info['logo'] = mapping.get('logo', current_info['logo'])
-
-                # Apply group filters
-                group = current_info.get('group', 'Uncategorized')
-                filter_mode = group_filters.get('mode', 'exclude')
-                filter_list = group_filters.get('groups', [])
-                if (filter_mode == 'exclude' and group in filter_list) or \
-                   (filter_mode == 'include' and group not in filter_list):
-                    continue
-
-                category = self.categorize_content(current_info['name'], group)
-                content_id = self.create_content_id(current_info['name'])
-
-                stream_details = {
-                    'url': stream_url,
-                    'provider': provider['name'],
-                    'resolution_rank': self._get_resolution_rank(current_info['name'])
-                }
-
-                if content_id not in all_content[category]:
-                    all_content[category][content_id] = {
-                        'name': current_info['name'],
-                        'group': group,
-                        'epg_id': current_info['epg_id'],
-                        'logo': current_info['logo'],
-                        'streams': [],
-                        'providers': []
-                    }
-                
-                all_content[category][content_id]['streams'].append(stream_details)
-                if provider['name'] not in all_content[category][content_id]['providers']:
-                    all_content[category][content_id]['providers'].append(provider['name'])
-                
-                current_info = {}
-
+        all_content = defaultdict(dict)
+        self._merge_m3u_entries(all_content, m3u_content, provider, group_filters, channel_mapping)
         return all_content
 
+    def parse_m3u_channels(self, m3u_content, provider, group_filters, channel_mapping):
+        """Parse M3U content straight into a flat channel list.
+
+        Same channels as parse_m3u_content, in category-then-playlist order, each tagged
+        with 'provider' and 'category'.
+        """
+        by_category = {}
+        self._merge_m3u_entries(by_category, m3u_content, provider, group_filters, channel_mapping,
+                                tag_category=True)
+        return [channel for channels in by_category.values() for channel in channels.values()]
+
+    def _merge_m3u_entries(self, all_content, m3u_content, provider, group_filters, channel_mapping,
+                           tag_category=False):
+        """Merge parsed entries into {category: {content_id: channel}}, one channel per content ID.
+
+        On multi-core hosts, playlists longer than one shard are cut at #EXTINF lines and the
+        shards are parsed in the shared process pool, then merged back in playlist order.
+        """
+        workers = os.cpu_count() or 1
+        if workers > 1 and ProcessPoolExecutor and not (
+                isinstance(m3u_content, str) and len(m3u_content) <= M3U_SHARD_SIZE):
+            shards = self._iter_m3u_shards(m3u_content)
+            first = next(shards, '')
+            second = next(shards, None)
+            if second is not None:
+                # At most two shards per worker are in flight, so a playlist read from a file
+                # is never held in memory all at once, not even as shards
+                executor = _get_parse_pool()
+                pending = deque()
+                for shard in itertools.chain((first, second), shards):
+                    pending.append(executor.submit(_merge_m3u_entries_serial, {}, shard, provider,
+                                                   group_filters, channel_mapping, tag_category))
+                    if len(pending) >= 2 * workers:
+                        self._merge_channel_maps(all_content, pending.popleft().result())
+                while pending:
+                    self._merge_channel_maps(all_content, pending.popleft().result())
+                return
+            # Only one shard: the file has been read, so parse what was collected
+            m3u_content = first
+
+        _merge_m3u_entries_serial(all_content, m3u_content, provider, group_filters,
+                                  channel_mapping, tag_category)
+
+    def _iter_m3u_shards(self, m3u_content):
+        """Cut M3U text or an open file into ~M3U_SHARD_SIZE-character pieces starting at #EXTINF lines.
+
+        Each #EXTINF line starts a fresh entry, so a shard parses exactly as it would in place.
+        """
+        if isinstance(m3u_content, str):
+            start = 0
+            while start < len(m3u_content):
+                cut = m3u_content.find('\n#EXTINF', start + M3U_SHARD_SIZE)
+                end = len(m3u_content) if cut < 0 else cut + 1
+                yield m3u_content[start:end]
+                start = end
+            return
+
+        shard, size = [], 0
+        for line in m3u_content:
+            if size >= M3U_SHARD_SIZE and line.startswith('#EXTINF'):
+                yield ''.join(shard)
+                shard, size = [], 0
+            shard.append(line)
+            size += len(line)
+        if shard:
+            yield ''.join(shard)
+
+    @staticmethod
+    def _merge_channel_maps(all_content, part):
+        """Fold a shard's {category: {content_id: channel}} into all_content, after what is already there."""
+        for category, channels in part.items():
+            merged = all_content.get(category)
+            if merged is None:
+                all_content[category] = channels
+                continue
+            for content_id, channel in channels.items():
+                existing = merged.get(content_id)
+                if existing is None:
+                    merged[content_id] = channel
+                    continue
+                existing['streams'].extend(channel['streams'])
+                for provider_name in channel['providers']:
+                    if provider_name not in existing['providers']:
+                        existing['providers'].append(provider_name)
 
     def _check_for_updates(self, providers):
         """Check proxy M3U for changes using content hashing."""
@@ -457,8 +739,10 @@ class MultiProviderM3UConverter:
         try:
             response = requests.get(proxy_url, timeout=30, verify=self.ssl_verify, stream=True)
             response.raise_for_status()
-            hasher = hashlib.md5()
-            for chunk in response.iter_content(chunk_size=8192):
+            # Change detection only needs a fingerprint: xxh3 when available, else SHA-256,
+            # which is hardware accelerated on current x86/ARM and faster than MD5 there
+            hasher = xxhash.xxh3_128() if xxhash else hashlib.sha256()
+            for chunk in response.iter_content(chunk_size=HASH_CHUNK_SIZE):
                 hasher.update(chunk)
             current_hash = hasher.hexdigest()
             
@@ -479,27 +763,36 @@ class MultiProviderM3UConverter:
     def _cleanup_old_files(self, generated_files):
         """Remove any STRM files that weren't generated in the current run."""
         logger.info("Cleaning up old files...")
-        base_dir_files = set()
-        for root, _, files in os.walk(self.base_dir):
-            for file in files:
-                if file.endswith('.strm'):
-                    base_dir_files.add(os.path.join(root, file))
-
-        to_delete = base_dir_files - generated_files
-        for file_path in to_delete:
-            try:
-                os.remove(file_path)
-                logger.info(f"Removed old file: {file_path}")
-            except OSError as e:
-                logger.error(f"Error removing file {file_path}: {e}")
-
-        # Clean up empty directories
-        for root, dirs, _ in os.walk(self.base_dir, topdown=False):
-            for d in dirs:
-                dir_path = os.path.join(root, d)
-                if not os.listdir(dir_path):
-                    os.rmdir(dir_path)
-                    logger.info(f"Removed empty directory: {dir_path}")
+        if os.path.isdir(self.base_dir):
+            self._cleanup_dir(self.base_dir, generated_files)
+
+    def _cleanup_dir(self, path, generated_files):
+        """Remove stale STRM files and emptied subdirectories in one scandir pass; True if path is left empty."""
+        with os.scandir(path) as it:
+            entries = list(it)
+
+        remaining = 0
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if self._cleanup_dir(entry.path, generated_files):
+                    try:
+                        os.rmdir(entry.path)
+                        logger.info(f"Removed empty directory: {entry.path}")
+                        continue
+                    except OSError as e:
+                        logger.error(f"Error removing directory {entry.path}: {e}")
+                remaining += 1
+            elif entry.name.endswith('.strm') and entry.path not in generated_files:
+                try:
+                    os.remove(entry.path)
+                    logger.info(f"Removed old file: {entry.path}")
+                    continue
+                except OSError as e:
+                    logger.error(f"Error removing file {entry.path}: {e}")
+                remaining += 1
+            else:
+                remaining += 1
+        return remaining == 0
 
     def _sanitize_filename(self, filename):
         """Safely sanitize filename to prevent path traversal attacks."""
@@ -507,8 +800,7 @@ class MultiProviderM3UConverter:
             return "unknown"
         
         # Remove path separators and dangerous characters
-        sanitized = re.sub(r'[/\\*?"<>|:.]', '', filename)
-        sanitized = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', sanitized)  # Remove control characters
+        sanitized = _UNSAFE_FILENAME_RE.sub('', filename)
         
         # Prevent reserved names on Windows
         reserved_names = {'CON', 'PRN', 'AUX', 'NUL', 'COM1', 'COM2', 'COM3', 'COM4', 
@@ -546,7 +838,7 @@ class MultiProviderM3UConverter:
         sanitized_name = self._sanitize_filename(item_name)
         
         # Validate category path
-        if not re.match(r'^[a-zA-Z0-9_\-\s]+$', category):
+        if not _CATEGORY_NAME_RE.match(category):
             logger.error(f"Invalid category name: {category}")
             return None
         
@@ -605,27 +897,32 @@ class MultiProviderM3UConverter:
         if temp_epg_files:
             self._merge_epg_files(temp_epg_files)
 
-        # M3U Processing - single proxy download for all providers
-        m3u_content = self.download_m3u("All Providers")
-        if not m3u_content:
+        # M3U Processing - single proxy download for all providers, streamed to disk
+        m3u_path = self.download_m3u_to_file("All Providers", os.path.join(self.base_dir, "temp_playlist.m3u"))
+        if not m3u_path:
             logger.error("Failed to download M3U content through proxy.")
             return
 
         all_providers_content = defaultdict(lambda: defaultdict(dict))
         
         # Parse content with provider-specific settings
-        providers = config.get('providers', [])
-        if providers:
-            # Use first enabled provider's settings for parsing
-            active_provider = next((p for p in providers if p.get('enabled', True)), providers[0] if providers else None)
-            if active_provider:
-                parsed_content = self.parse_m3u_content(
-                    m3u_content,
-                    active_provider,
-                    config.get('group_filters', {}),
-                    config.get('channel_mapping', {})
-                )
-                all_providers_content.update(parsed_content)
+        try:
+            providers = config.get('providers', [])
+            if providers:
+                # Use first enabled provider's settings for parsing
+                active_provider = next((p for p in providers if p.get('enabled', True)), providers[0] if providers else None)
+                if active_provider:
+                    with open(m3u_path, 'r', encoding='utf-8', errors='replace',
+                              buffering=M3U_IO_BUFFER) as m3u_file:
+                        parsed_content = self.parse_m3u_content(
+                            m3u_file,
+                            active_provider,
+                            config.get('group_filters', {}),
+                            config.get('channel_mapping', {})
+                        )
+                    all_providers_content.update(parsed_content)
+        finally:
+            os.remove(m3u_path) # Clean up temp file
 
         if dry_run:
             logger.info("--- Dry Run Summary ---")
@@ -17,10 +17,15 @@ import hashlib
 
 logger = logging.getLogger(__name__)
 
+# Connection pool for logo lookups and downloads, shared by every channel and provider
+LOGO_CONNECTION_LIMIT = 64
+LOGO_CONNECTION_LIMIT_PER_HOST = 8
+
 class LogoEnhancer:
     """Enhanced logo fetching and management system"""
     
-    def __init__(self, cache_dir: str = "logos_cache"):
+    def __init__(self, cache_dir: str = "logos_cache",
+                 session: Optional[aiohttp.ClientSession] = None):
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
         
@@ -48,6 +53,35 @@ class LogoEnhancer:
         self.channel_mappings = {}
         self.load_cache()
         
+        # Shared HTTP session, created on first use inside the running event loop
+        # unless the caller supplies one (and then stays responsible for closing it)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._owns_session = True
+        if session is not None:
+            self.use_session(session)
+    
+    def use_session(self, session: aiohttp.ClientSession):
+        """Fetch logos over a session owned by the caller"""
+        self._session = session
+        self._owns_session = False
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Pooled session reused across channels instead of one session per lookup"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=LOGO_CONNECTION_LIMIT,
+                                               limit_per_host=LOGO_CONNECTION_LIMIT_PER_HOST,
+                                               ttl_dns_cache=300)
+            )
+            self._owns_session = True
+        return self._session
+    
+    async def close(self):
+        """Close the HTTP session if this enhancer created it"""
+        if self._session is not None and self._owns_session:
+            await self._session.close()
+        self._session = None
+        
     def load_cache(self):
         """Load logo cache from disk"""
         cache_file = self.cache_dir / "logo_cache.json"
@@ -209,16 +243,16 @@ class LogoEnhancer:
             return existing_logo
         
         # Search for better logo
-        async with aiohttp.ClientSession() as session:
-            for source in self.logo_sources:
-                logo_url = await self.fetch_logo_from_source(session, source, channel_name)
-                if logo_url:
-                    # Download and cache
-                    local_path = await self.download_logo(session, logo_url, channel_name)
-                    if local_path:
-                        self.logo_cache[cache_key] = local_path
-                        self.save_cache()
-                        return local_path
+        session = self._get_session()
+        for source in self.logo_sources:
+            logo_url = await self.fetch_logo_from_source(session, source, channel_name)
+            if logo_url:
+                # Download and cache
+                local_path = await self.download_logo(session, logo_url, channel_name)
+                if local_path:
+                    self.logo_cache[cache_key] = local_path
+                    self.save_cache()
+                    return local_path
         
         # No enhancement found, cache the existing logo if any
         if existing_logo:
@@ -372,9 +406,13 @@ class LogoEnhancer:
 class IPTVLogoEnhancer:
     """Integration class for IPTV Manager"""
     
-    def __init__(self, iptv_manager):
+    def __init__(self, iptv_manager, session: Optional[aiohttp.ClientSession] = None):
         self.iptv_manager = iptv_manager
-        self.logo_enhancer = LogoEnhancer()
+        self.logo_enhancer = LogoEnhancer(session=session)
+    
+    def use_session(self, session: aiohttp.ClientSession):
+        """Fetch logos over a caller-owned HTTP session"""
+        self.logo_enhancer.use_session(session)
     
     async def enhance_provider_logos(self, provider_name: str):
         """Enhance logos for a specific provider"""
@@ -383,14 +421,15 @@ class IPTVLogoEnhancer:
         
         for provider in providers:
             if provider.get('name') == provider_name and provider.get('enabled', True):
-                # Get M3U content
-                m3u_content = self.iptv_manager.download_m3u(provider_name)
+                # Get M3U content (blocking download; keep it off the event loop so
+                # several providers can be enhanced concurrently)
+                m3u_content = await asyncio.to_thread(self.iptv_manager.download_m3u, provider_name)
                 if not m3u_content:
                     continue
                 
                 # Parse channels
-                parsed_content = self.iptv_manager.parse_m3u_content(
-                    m3u_content, provider, {}, {}
+                parsed_content = await asyncio.to_thread(
+                    self.iptv_manager.parse_m3u_content, m3u_content, provider, {}, {}
                 )
                 
                 # Enhance logos for each category
@@ -406,6 +445,10 @@ class IPTVLogoEnhancer:
                 
                 logger.info(f"Enhanced logos for provider: {provider_name}")
                 break
+    
+    async def close(self):
+        """Release the logo enhancer's HTTP session"""
+        await self.logo_enhancer.close()
 
 # Example usage
 async def main():
@@ -430,6 +473,8 @@ async def main():
     # Print statistics
     stats = enhancer.get_logo_statistics()
     print(f"\nStatistics: {stats}")
+    
+    await enhancer.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -52,6 +52,7 @@ class PerformanceOptimizer:
         self.monitoring_active = False
         self.monitoring_task = None
         self.optimization_callbacks = []
+        self.metrics_callbacks = []
         
     def _create_default_profiles(self) -> Dict[str, OptimizationProfile]:
         """Create default optimization profiles"""
@@ -148,9 +149,10 @@ class PerformanceOptimizer:
             logger.error(f"Failed to collect system metrics: {e}")
             return SystemMetrics(0, 0, 0, 0, 0, 0, 0, time.time())
     
-    def analyze_system_capacity(self) -> Dict[str, Any]:
-        """Analyze system capacity and recommend profile"""
-        metrics = self.get_system_metrics()
+    def analyze_system_capacity(self, metrics: Optional[SystemMetrics] = None) -> Dict[str, Any]:
+        """Analyze system capacity and recommend profile (samples metrics unless given)"""
+        if metrics is None:
+            metrics = self.get_system_metrics()
         
         # Determine system class based on resources
         total_memory_gb = psutil.virtual_memory().total / (1024**3)
@@ -196,9 +198,9 @@ class PerformanceOptimizer:
             }
         }
     
-    def select_optimal_profile(self) -> OptimizationProfile:
+    def select_optimal_profile(self, metrics: Optional[SystemMetrics] = None) -> OptimizationProfile:
         """Select optimal performance profile based on current conditions"""
-        analysis = self.analyze_system_capacity()
+        analysis = self.analyze_system_capacity(metrics)
         recommended_profile_name = analysis['recommended_profile']
         
         profile = self.optimization_profiles.get(recommended_profile_name)
@@ -259,6 +261,10 @@ class PerformanceOptimizer:
         """Register callback for profile changes"""
         self.optimization_callbacks.append(callback)
     
+    def register_metrics_callback(self, callback):
+        """Register callback for each metrics sample taken by the monitoring loop"""
+        self.metrics_callbacks.append(callback)
+    
     def start_monitoring(self, interval: int = 30):
         """Start continuous performance monitoring"""
         if self.monitoring_active:
@@ -279,16 +285,23 @@ class PerformanceOptimizer:
         """Continuous monitoring loop"""
         try:
             while self.monitoring_active:
-                # Collect metrics
-                metrics = self.get_system_metrics()
+                # Collect metrics (on a worker thread; psutil blocks for ~1s per sample)
+                metrics = await asyncio.to_thread(self.get_system_metrics)
                 self.metrics_history.append(metrics)
                 
+                for callback in self.metrics_callbacks:
+                    try:
+                        callback(metrics)
+                    except Exception as e:
+                        logger.error(f"Metrics callback failed: {e}")
+                
                 # Keep only last 100 metrics (about 50 minutes at 30s interval)
                 if len(self.metrics_history) > 100:
                     self.metrics_history.pop(0)
                 
-                # Check if profile adjustment is needed
-                optimal_profile = self.select_optimal_profile()
+                # Check if profile adjustment is needed, reusing the sample just taken
+                # rather than blocking the event loop on another one
+                optimal_profile = self.select_optimal_profile(metrics)
                 
                 if (not self.current_profile or 
                     optimal_profile.name != self.current_profile.name or
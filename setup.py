@@ -65,7 +65,6 @@ class JellyfinIPTVSetup:
         required_packages = [
             'requests',
             'aiohttp',
-            'aiohttp-cors',
             'psutil',
             'asyncio'
         ]
@@ -156,6 +155,16 @@ class JellyfinIPTVSetup:
             else:
                 logger.warning(f"Script not found: {script}")
         
+        # Pages served from disk by the enhanced web UI
+        static_dir = self.script_dir / 'web_static'
+        if static_dir.is_dir():
+            try:
+                shutil.copytree(static_dir, self.install_dir / 'web_static', dirs_exist_ok=True)
+                logger.info("✅ Installed: web_static/")
+            except Exception as e:
+                logger.error(f"Failed to install web_static: {e}")
+                return False
+        
         return True
     
     def install_plugin(self):
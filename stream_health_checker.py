@@ -6,6 +6,7 @@ Parallel stream testing and health monitoring with detailed reporting
 
 import asyncio
 import aiohttp
+import random
 import time
 import json
 import logging
@@ -17,6 +18,12 @@ import statistics
 
 logger = logging.getLogger(__name__)
 
+# Seconds a stream found online is trusted before IPTVHealthMonitor probes it again;
+# failed streams are always rechecked. Each reuse adds a random exponential slack
+# (mean HEALTH_RECHECK_JITTER seconds) so cached streams don't all expire together.
+HEALTH_RECHECK_TTL = 600
+HEALTH_RECHECK_JITTER = 60
+
 @dataclass
 class StreamHealth:
     """Stream health status information"""
@@ -58,21 +65,42 @@ class ChannelHealthReport:
 class StreamHealthChecker:
     """Advanced stream health checking with parallel processing"""
     
-    def __init__(self, max_concurrent: int = 10, timeout: int = 10):
+    def __init__(self, max_concurrent: int = 10, timeout: int = 10,
+                 session: Optional[aiohttp.ClientSession] = None, recheck_ttl: float = 0):
         self.max_concurrent = max_concurrent
         self.timeout = timeout
-        self.session = None
         self.health_history = {}
+        # Last result per stream URL; online results younger than recheck_ttl are reused
+        self.recheck_ttl = recheck_ttl
+        self.url_health: Dict[str, StreamHealth] = {}
+        self._session_users = 0  # open `async with` blocks sharing self.session
+        # Per-request so checks keep their own timeout on a session shared with other components
+        self._request_timeout = aiohttp.ClientTimeout(total=timeout, connect=5)
+        self.session = None
+        self._owns_session = True
+        if session is not None:
+            self.use_session(session)
+    
+    def use_session(self, session: aiohttp.ClientSession):
+        """Check streams over a session owned (and closed) by the caller"""
+        self.session = session
+        self._owns_session = False
         
     async def __aenter__(self):
-        connector = aiohttp.TCPConnector(limit=self.max_concurrent, limit_per_host=5)
-        timeout = aiohttp.ClientTimeout(total=self.timeout, connect=5)
-        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        # Re-entrant: concurrent or nested users share one session, closed by the last to leave
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrent, limit_per_host=5,
+                                             ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self._request_timeout)
+            self._owns_session = True
+        self._session_users += 1
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
+        self._session_users -= 1
+        if self._session_users == 0 and self.session and self._owns_session:
             await self.session.close()
+            self.session = None
     
     async def check_stream_health(self, url: str) -> StreamHealth:
         """Check health of a single stream"""
@@ -89,7 +117,7 @@ class StreamHealthChecker:
                 )
             
             # Make HEAD request first (faster)
-            async with self.session.head(url) as response:
+            async with self.session.head(url, timeout=self._request_timeout) as response:
                 response_time = time.time() - start_time
                 
                 if response.status == 200:
@@ -140,7 +168,7 @@ class StreamHealthChecker:
     async def check_stream_content(self, url: str, sample_size: int = 1024) -> Dict[str, Any]:
         """Check stream content by downloading a small sample"""
         try:
-            async with self.session.get(url) as response:
+            async with self.session.get(url, timeout=self._request_timeout) as response:
                 if response.status == 200:
                     # Read small sample
                     content = await response.content.read(sample_size)
@@ -183,22 +211,21 @@ class StreamHealthChecker:
                 streams=[]
             )
         
-        # Check all stream URLs
-        tasks = []
-        for stream in streams:
-            url = stream.get('url', '')
-            if url:
-                tasks.append(self.check_stream_health(url))
+        # Check all stream URLs, reusing recent online results
+        urls = [url for url in (stream.get('url', '') for stream in streams) if url]
+        health_results = [self._recent_health(url) for url in urls]
+        pending = [i for i, health in enumerate(health_results) if health is None]
         
-        stream_results = await asyncio.gather(*tasks, return_exceptions=True)
+        stream_results = await asyncio.gather(*(self.check_stream_health(urls[i]) for i in pending),
+                                              return_exceptions=True)
         
         # Filter out exceptions and create health objects
-        health_results = []
-        for result in stream_results:
+        for i, result in zip(pending, stream_results):
             if isinstance(result, StreamHealth):
-                health_results.append(result)
+                health_results[i] = self.url_health[urls[i]] = result
             elif isinstance(result, Exception):
                 logger.error(f"Stream check failed: {result}")
+        health_results = [health for health in health_results if health is not None]
         
         return ChannelHealthReport(
             channel_name=channel.get('name', 'Unknown'),
@@ -206,6 +233,16 @@ class StreamHealthChecker:
             streams=health_results
         )
     
+    def _recent_health(self, url: str) -> Optional[StreamHealth]:
+        """Previous online result for url if still within recheck_ttl"""
+        if self.recheck_ttl <= 0:
+            return None
+        health = self.url_health.get(url)
+        if health is None or health.status != 'online':
+            return None
+        age = time.time() - health.timestamp + random.expovariate(1.0) * HEALTH_RECHECK_JITTER
+        return health if age < self.recheck_ttl else None
+    
     async def check_batch_health(self, channels: List[Dict[str, Any]], 
                                progress_callback=None) -> List[ChannelHealthReport]:
         """Check health of multiple channels with progress tracking"""
@@ -349,9 +386,14 @@ class StreamHealthChecker:
 class IPTVHealthMonitor:
     """Integration class for IPTV Manager health monitoring"""
     
-    def __init__(self, iptv_manager):
+    def __init__(self, iptv_manager, session: Optional[aiohttp.ClientSession] = None):
         self.iptv_manager = iptv_manager
-        self.health_checker = StreamHealthChecker()
+        # Monitoring runs every update; streams confirmed online recently are not re-probed
+        self.health_checker = StreamHealthChecker(session=session, recheck_ttl=HEALTH_RECHECK_TTL)
+    
+    def use_session(self, session: aiohttp.ClientSession):
+        """Run health checks over a caller-owned HTTP session"""
+        self.health_checker.use_session(session)
     
     async def monitor_provider_health(self, provider_name: str) -> Dict[str, Any]:
         """Monitor health of a specific provider"""
@@ -360,22 +402,22 @@ class IPTVHealthMonitor:
         
         for provider in providers:
             if provider.get('name') == provider_name and provider.get('enabled', True):
-                # Get M3U content
-                m3u_content = self.iptv_manager.download_m3u(provider_name)
+                # Get M3U content (blocking; off the event loop so providers overlap)
+                m3u_content = await asyncio.to_thread(self.iptv_manager.download_m3u, provider_name)
                 if not m3u_content:
                     return {'error': f'Failed to download M3U for {provider_name}'}
                 
                 # Parse channels
-                parsed_content = self.iptv_manager.parse_m3u_content(
-                    m3u_content, provider, {}, {}
+                parsed_content = await asyncio.to_thread(
+                    self.iptv_manager.parse_m3u_content, m3u_content, provider, {}, {}
                 )
                 
-                # Convert to channel list
-                all_channels = []
-                for category, channels in parsed_content.items():
-                    for channel_name, channel_data in channels.items():
-                        channel_data['id'] = f"{provider_name}_{channel_name}"
-                        all_channels.append(channel_data)
+                # Convert to channel list in one pass, ids assigned as each entry is built
+                all_channels = [
+                    {**channel_data, 'id': f"{provider_name}_{channel_name}"}
+                    for channels in parsed_content.values()
+                    for channel_name, channel_data in channels.items()
+                ]
                 
                 # Check health
                 async with self.health_checker:
@@ -395,17 +437,22 @@ class IPTVHealthMonitor:
         config = self.iptv_manager.load_config()
         providers = config.get('providers', [])
         
-        all_reports = {}
+        provider_names = [provider.get('name', '') for provider in providers
+                          if provider.get('enabled', True)]
         
-        for provider in providers:
-            if provider.get('enabled', True):
-                provider_name = provider.get('name', '')
-                try:
-                    report = await self.monitor_provider_health(provider_name)
-                    all_reports[provider_name] = report
-                except Exception as e:
-                    logger.error(f"Failed to monitor provider {provider_name}: {e}")
-                    all_reports[provider_name] = {'error': str(e)}
+        # Providers are checked concurrently over one shared session
+        async with self.health_checker:
+            results = await asyncio.gather(
+                *(self.monitor_provider_health(name) for name in provider_names),
+                return_exceptions=True
+            )
+        
+        all_reports = {}
+        for provider_name, report in zip(provider_names, results):
+            if isinstance(report, Exception):
+                logger.error(f"Failed to monitor provider {provider_name}: {report}")
+                report = {'error': str(report)}
+            all_reports[provider_name] = report
         
         return all_reports
 
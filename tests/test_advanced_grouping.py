@@ -0,0 +1,46 @@
+import advanced_grouping
+from advanced_grouping import AdvancedGrouping
+
+
+def _channels():
+    return [
+        {'name': 'Alpha', 'group': None},
+        {'name': 'Beta', 'group': 'Club'},
+        {'name': 'Gamma', 'group': None},
+        {'name': 'Delta', 'group': 'Amateur'},
+    ]
+
+
+def test_original_grouping_accepts_none_groups():
+    grouped = AdvancedGrouping().organize_channels(_channels(), "original")
+
+    assert list(grouped) == ['Amateur', 'Club', None]
+    assert [c['name'] for c in grouped[None]] == ['Alpha', 'Gamma']
+
+
+def test_smart_fallback_accepts_none_groups():
+    grouped = AdvancedGrouping().organize_channels(_channels(), "smart")
+
+    assert list(grouped) == ['Amateur', 'Club', None]
+    assert [c['name'] for c in grouped[None]] == ['Alpha', 'Gamma']
+
+
+def test_vectorized_grouping_accepts_none_groups(monkeypatch):
+    monkeypatch.setattr(advanced_grouping, 'VECTORIZE_THRESHOLD', 0)
+    grouping = AdvancedGrouping()
+
+    for strategy in ("original", "smart"):
+        grouped = grouping._organize_channels_serial(_channels(), strategy)
+        assert list(grouped) == ['Amateur', 'Club', None]
+
+
+def test_vectorized_grouping_accepts_none_names(monkeypatch):
+    channels = _channels() + [{'name': None, 'group': 'News'}, {'name': None, 'group': None}]
+    grouping = AdvancedGrouping()
+
+    for strategy in ("smart", "country", "category", "quality", "original"):
+        serial = grouping._organize_channels_serial([dict(c) for c in channels], strategy)
+        with monkeypatch.context() as patch:
+            patch.setattr(advanced_grouping, 'VECTORIZE_THRESHOLD', 0)
+            vectorized = grouping._organize_channels_serial([dict(c) for c in channels], strategy)
+        assert vectorized == serial, strategy
@@ -0,0 +1,196 @@
+import asyncio
+import time
+import types
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+import enhanced_web_ui
+import iptv_manager
+
+
+def test_app_factory_serves_dashboard_and_api():
+    async def run():
+        app = await enhanced_web_ui.app_factory()
+        async with TestClient(TestServer(app)) as client:
+            resp = await client.get('/')
+            assert resp.status == 200
+
+            resp = await client.get('/api/status')
+            assert resp.status == 200
+            assert 'total_providers' in await resp.json()
+
+            resp = await client.get('/api/channels')
+            assert resp.status == 200
+            assert isinstance(await resp.json(), list)
+
+    asyncio.run(run())
+
+
+class _StubManager(iptv_manager.MultiProviderM3UConverter):
+    """Real playlist parsing over a canned download"""
+
+    def __init__(self, playlist=''):
+        super().__init__()
+        self.playlist = playlist
+
+    def load_config(self):
+        return {'providers': [{'name': 'Provider A'}]}
+
+    def download_m3u(self, provider_name, max_retries=3):
+        return self.playlist
+
+
+def _stub_web_ui(playlist=''):
+    web_ui = enhanced_web_ui.EnhancedWebUI(_StubManager(playlist))
+    samples = []
+
+    async def get_metrics():
+        samples.append(None)
+        return types.SimpleNamespace(cpu_percent=12.5, memory_percent=40.0, timestamp=time.time())
+
+    web_ui._get_metrics = get_metrics
+    web_ui.setup_routes()
+    return web_ui, samples
+
+
+def test_channels_revalidates_with_etag():
+    async def run():
+        web_ui, _ = _stub_web_ui()
+        async with TestClient(TestServer(web_ui.app)) as client:
+            resp = await client.get('/api/channels')
+            assert resp.status == 200
+            etag = resp.headers['ETag']
+            assert resp.headers['Cache-Control'] == enhanced_web_ui.CHANNELS_CACHE_CONTROL
+            assert await resp.json() == [{'provider': 'Provider A', 'channels': []}]
+
+            resp = await client.get('/api/channels', headers={'If-None-Match': etag})
+            assert resp.status == 304
+            assert resp.headers['ETag'] == etag
+
+    asyncio.run(run())
+
+
+def test_status_reuses_snapshot():
+    async def run():
+        web_ui, samples = _stub_web_ui()
+        async with TestClient(TestServer(web_ui.app)) as client:
+            first = await (await client.get('/api/status')).json()
+            resp = await client.get('/api/status')
+            assert resp.status == 200
+            assert resp.headers['Cache-Control'] == f'max-age={enhanced_web_ui.STATUS_CACHE_SECONDS}'
+            assert await resp.json() == first
+            assert first['total_providers'] == 1
+            assert len(samples) == 1
+
+    asyncio.run(run())
+
+
+def test_dashboard_page_and_actions():
+    async def run():
+        web_ui, _ = _stub_web_ui()
+        async with TestClient(TestServer(web_ui.app)) as client:
+            resp = await client.get('/', headers={'Origin': 'http://jellyfin.local'})
+            assert resp.status == 200
+            assert await resp.read() == web_ui._index_path.read_bytes()
+            assert resp.headers['Access-Control-Allow-Origin'] == 'http://jellyfin.local'
+
+            resp = await client.get('/static/dashboard.html')
+            assert resp.status == 200
+            assert await resp.read() == web_ui._index_path.read_bytes()
+
+            for path in ('/api/health/check', '/api/logos/enhance', '/api/performance'):
+                resp = await client.post(path)
+                assert resp.status == 200, path
+                assert (await resp.json())['status'] == 'completed'
+
+    asyncio.run(run())
+
+
+def _playlist(stream_url, logo_url=''):
+    return ('#EXTM3U\n'
+            f'#EXTINF:-1 tvg-id="news.uk" tvg-logo="{logo_url}" group-title="News",World News\n'
+            f'{stream_url}\n')
+
+
+async def _channel_path(client, kind):
+    """Proxy path for the one channel, as listed by /api/channels"""
+    [entry] = await (await client.get('/api/channels')).json()
+    [channel] = entry['channels']
+    assert channel['name'] == 'World News'
+    return f"/proxy/{kind}/{entry['provider']}/{channel['id']}"
+
+
+def test_proxy_stream_relays_chunked_body_and_errors():
+    chunks = [bytes([i]) * 100_000 for i in range(5)]
+
+    async def chunked(request):
+        resp = web.StreamResponse(headers={'Content-Type': 'video/mp2t', 'X-Upstream': 'yes'})
+        resp.enable_chunked_encoding()
+        await resp.prepare(request)
+        for chunk in chunks:
+            await resp.write(chunk)
+        await resp.write_eof()
+        return resp
+
+    async def unavailable(request):
+        return web.Response(status=503, text='busy')
+
+    async def run():
+        upstream_app = web.Application()
+        upstream_app.router.add_get('/live.ts', chunked)
+        upstream_app.router.add_get('/down.ts', unavailable)
+        async with TestServer(upstream_app) as upstream:
+            web_ui, _ = _stub_web_ui(_playlist(upstream.make_url('/live.ts')))
+            async with TestClient(TestServer(web_ui.app)) as client:
+                path = await _channel_path(client, 'stream')
+                resp = await client.get(path)
+                assert resp.status == 200
+                assert resp.headers['Content-Type'] == 'video/mp2t'
+                assert resp.headers['X-Upstream'] == 'yes'
+                assert await resp.read() == b''.join(chunks)
+
+                # Provider now serves the channel from a failing upstream
+                web_ui.iptv_manager.playlist = _playlist(upstream.make_url('/down.ts'))
+                web_ui.cache['last_update'] = None
+                resp = await client.get(path)
+                assert resp.status == 503
+                assert await resp.text() == 'busy'
+
+                resp = await client.get('/proxy/stream/Provider A/missing')
+                assert resp.status == 404
+
+        # Upstream gone entirely
+        async with TestClient(TestServer(web_ui.app)) as client:
+            resp = await client.get(path)
+            assert resp.status == 502
+
+    asyncio.run(run())
+
+
+def test_proxy_logo_caches_and_revalidates(tmp_path):
+    fetches = []
+
+    async def logo(request):
+        fetches.append(request.path)
+        return web.Response(body=b'\x89PNG logo', content_type='image/png')
+
+    async def run():
+        upstream_app = web.Application()
+        upstream_app.router.add_get('/logo.png', logo)
+        async with TestServer(upstream_app) as upstream:
+            web_ui, _ = _stub_web_ui(_playlist('http://example.invalid/live.ts', upstream.make_url('/logo.png')))
+            web_ui._logo_dir = tmp_path
+            async with TestClient(TestServer(web_ui.app)) as client:
+                path = await _channel_path(client, 'logo')
+                resp = await client.get(path)
+                assert resp.status == 200
+                assert resp.content_type == 'image/png'
+                assert await resp.read() == b'\x89PNG logo'
+                etag = resp.headers['ETag']
+
+                resp = await client.get(path, headers={'If-None-Match': etag})
+                assert resp.status == 304
+                assert fetches == ['/logo.png']
+
+    asyncio.run(run())
@@ -0,0 +1,50 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import ip_failover_manager
+
+
+PLAYLIST = ('#EXTM3U\n'
+            '#EXTINF:-1 tvg-id="news.uk" group-title="UK",World News\n'
+            'http://upstream/news.ts\n'
+            '#EXTINF:-1 tvg-id="sport.uk" tvg-chno="7" group-title="UK",Sport One\n'
+            'http://upstream/sport.ts\n')
+
+
+def test_channel_lookups_stay_bounded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ip_failover_manager, 'M3U_RESOLVED_CACHE_SIZE', 4)
+
+    async def playlist(request):
+        return web.Response(text=PLAYLIST)
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/list.m3u', playlist)
+        manager = ip_failover_manager.IPFailoverManager(str(tmp_path / 'config.json'))
+        try:
+            async with TestServer(app) as upstream:
+                m3u_url = str(upstream.make_url('/list.m3u'))
+                lookup = manager.get_channel_stream_from_m3u
+
+                assert await lookup(m3u_url, 'news.uk') == 'http://upstream/news.ts'
+                assert await lookup(m3u_url, 'World News') == 'http://upstream/news.ts'
+                assert await lookup(m3u_url, 'tvg-chno="7"') == 'http://upstream/sport.ts'
+
+                # Unknown ids still get a stable stream, but are not remembered
+                fallback = await lookup(m3u_url, 'no-such-channel')
+                assert fallback in ('http://upstream/news.ts', 'http://upstream/sport.ts')
+                assert await lookup(m3u_url, 'no-such-channel') == fallback
+
+                for i in range(100):
+                    await lookup(m3u_url, f'client-chosen-{i}')
+
+                cached = manager._m3u_cache[m3u_url]
+                assert set(cached.channels) == {'news.uk', 'World News', 'sport.uk', 'Sport One'}
+                assert len(cached.resolved) == 4
+        finally:
+            await manager.close()
+
+    asyncio.run(run())
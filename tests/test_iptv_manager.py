@@ -0,0 +1,44 @@
+import xml.etree.ElementTree as StdET
+
+import pytest
+
+import iptv_manager
+
+
+def _write_epg(path, channel_ids, programmes):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<tv>']
+    lines += [f'  <channel id="{cid}"><display-name>{cid}</display-name></channel>' for cid in channel_ids]
+    lines += [f'  <programme channel="{cid}" start="{start}" stop="{start}5"><title>{cid} {start}</title></programme>'
+              for cid, start in programmes]
+    lines.append('</tv>')
+    path.write_text('\n'.join(lines), encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture(params=['lxml', 'stdlib'])
+def epg_backend(request, monkeypatch):
+    if request.param == 'lxml':
+        if not iptv_manager.LXML_AVAILABLE:
+            pytest.skip('lxml is not installed')
+    else:
+        monkeypatch.setattr(iptv_manager, 'ET', StdET)
+        monkeypatch.setattr(iptv_manager, 'LXML_AVAILABLE', False)
+    return request.param
+
+
+def test_merge_epg_files_keeps_unique_entries(tmp_path, epg_backend):
+    first = _write_epg(tmp_path / 'a.xml', ['one', 'two'],
+                       [('one', f'2024010{i}') for i in range(10)])
+    second = _write_epg(tmp_path / 'b.xml', ['two', 'three'],
+                        [('one', '20240100'), ('two', '20240101'), ('three', '20240102')])
+
+    converter = iptv_manager.MultiProviderM3UConverter()
+    converter.base_dir = str(tmp_path)
+    converter._merge_epg_files([first, second])
+
+    root = StdET.parse(tmp_path / converter.epg_file).getroot()
+    assert sorted(c.get('id') for c in root.findall('channel')) == ['one', 'three', 'two']
+    programmes = [(p.get('channel'), p.get('start'), p.findtext('title')) for p in root.findall('programme')]
+    assert programmes == ([('one', f'2024010{i}', f'one 2024010{i}') for i in range(10)]
+                          + [('two', '20240101', 'two 20240101'), ('three', '20240102', 'three 20240102')])
+    assert not (tmp_path / 'a.xml').exists() and not (tmp_path / 'b.xml').exists()
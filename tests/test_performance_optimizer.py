@@ -0,0 +1,31 @@
+import asyncio
+import threading
+import time
+
+from performance_optimizer import PerformanceOptimizer, SystemMetrics
+
+
+def test_monitoring_loop_samples_off_the_event_loop():
+    optimizer = PerformanceOptimizer()
+    loop_thread = threading.get_ident()
+    samples = []
+
+    def get_system_metrics():
+        samples.append(threading.get_ident())
+        time.sleep(0.2)  # stands in for psutil.cpu_percent(interval=1)
+        return SystemMetrics(20.0, 40.0, 8.0, 10.0, 0.0, 0.3, 5, time.time())
+
+    optimizer.get_system_metrics = get_system_metrics
+
+    async def run():
+        optimizer.start_monitoring(interval=0)
+        while len(samples) < 3:
+            await asyncio.sleep(0.01)
+        optimizer.stop_monitoring()
+
+    asyncio.run(run())
+
+    # Each pass samples once, on a worker thread, and picks the profile from that sample
+    assert loop_thread not in samples
+    assert len(optimizer.metrics_history) >= len(samples) - 1
+    assert optimizer.current_profile is not None